@@ -5,7 +5,7 @@ import time
 import hashlib
 import hmac
 import secrets
-from collections import deque
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 from html import escape
 from typing import Any, Dict, List, Optional, Tuple
@@ -23,9 +23,9 @@ except ImportError:
     from persona_core import PersonaMatcher
 
 try:
-    from .ptd_core import PromptThreatDetector  # type: ignore
+    from .ptd_core import PromptThreatDetector, get_default_detector  # type: ignore
 except ImportError:
-    from ptd_core import PromptThreatDetector
+    from ptd_core import PromptThreatDetector, get_default_detector
 
 STATUS_PANEL_TEMPLATE = """
 <!DOCTYPE html>
@@ -769,21 +769,19 @@ class PromptGuardianWebUI:
                 target = params.get("target", [""])[0].strip()
                 if not target:
                     return "需要提供用户 ID", False
-                whitelist = config.get("whitelist", [])
-                if target in whitelist:
+                if target in self.plugin._whitelist_set:
                     return "该用户已在白名单", False
-                whitelist.append(target)
-                config["whitelist"] = whitelist
-                save()
+                self.plugin._whitelist.append(target)
+                self.plugin._whitelist_set.add(target)
+                self.plugin._mark_dirty()
                 message = f"{target} 已加入白名单"
             elif action == "remove_whitelist":
                 target = params.get("target", [""])[0].strip()
-                whitelist = config.get("whitelist", [])
-                if target not in whitelist:
+                if target not in self.plugin._whitelist_set:
                     return "用户不在白名单", False
-                whitelist.remove(target)
-                config["whitelist"] = whitelist
-                save()
+                self.plugin._whitelist.remove(target)
+                self.plugin._whitelist_set.discard(target)
+                self.plugin._mark_dirty()
                 message = f"{target} 已移出白名单"
             elif action == "add_blacklist":
                 target = params.get("target", [""])[0].strip()
@@ -794,22 +792,18 @@ class PromptGuardianWebUI:
                     duration = int(duration_str)
                 except ValueError:
                     return "封禁时长必须是数字", False
-                blacklist = config.get("blacklist", {})
+                blacklist = self.plugin._blacklist
                 if duration <= 0:
                     blacklist[target] = float("inf")
                 else:
                     blacklist[target] = time.time() + duration * 60
-                config["blacklist"] = blacklist
-                save()
+                self.plugin._mark_dirty()
                 message = f"{target} 已加入黑名单"
             elif action == "remove_blacklist":
                 target = params.get("target", [""])[0].strip()
-                blacklist = config.get("blacklist", {})
-                if target not in blacklist:
+                if self.plugin._blacklist.pop(target, None) is None:
                     return "用户不在黑名单", False
-                del blacklist[target]
-                config["blacklist"] = blacklist
-                save()
+                self.plugin._mark_dirty()
                 message = f"{target} 已移出黑名单"
             elif action == "clear_history":
                 self.plugin.recent_incidents.clear()
@@ -830,8 +824,8 @@ class PromptGuardianWebUI:
         stats = self.plugin.stats
         incidents = self._filter_incidents(params or {})
         analysis_logs = self._filter_logs(params or {})
-        whitelist = config.get("whitelist", [])
-        blacklist = config.get("blacklist", {})
+        whitelist = self.plugin._whitelist
+        blacklist = self.plugin._blacklist
         defense_mode = config.get("defense_mode", "sentry")
         llm_mode = config.get("llm_analysis_mode", "standby")
         private_llm = config.get("llm_analysis_private_chat_enabled", False)
@@ -1260,9 +1254,17 @@ class AntiPromptInjector(Star):
             if key not in self.config:
                 self.config[key] = value
         self.config.save_config()
-
-        self.detector = PromptThreatDetector()
-        self.ptd_version = getattr(self.detector, "version", "unknown")
+        # 名单容器原地修改，持久化由 _mark_dirty 统一调度
+        self._blacklist: Dict[str, float] = self.config["blacklist"]
+        self._whitelist: List[str] = self.config["whitelist"]
+        # 热路径成员判断使用集合；列表仍保留在配置中用于持久化与展示顺序
+        self._whitelist_set: set = set(self._whitelist)
+        self._config_dirty = False
+
+        # 复用 ptd_core 的共享检测器实例；构建耗时较长，放到线程中进行以免阻塞插件加载
+        self.detector: Optional[PromptThreatDetector] = None
+        self._detector_task = asyncio.create_task(asyncio.to_thread(get_default_detector))
+        self.ptd_version = getattr(PromptThreatDetector, "version", "unknown")
         self.plugin_version = PLUGIN_VERSION
         history_size = max(10, int(self.config.get("incident_history_size", 100)))
         self.recent_incidents: deque = deque(maxlen=history_size)
@@ -1278,10 +1280,12 @@ class AntiPromptInjector(Star):
         self.last_llm_analysis_time: Optional[float] = None
         self.monitor_task = asyncio.create_task(self._monitor_llm_activity())
         self.cleanup_task = asyncio.create_task(self._cleanup_expired_bans())
+        self._flush_task = asyncio.create_task(self._flush_config_loop())
         self.webui_sessions: Dict[str, float] = {}
         self.webui_csrf_tokens: Dict[str, str] = {}
         self.failed_login_attempts: Dict[str, List[float]] = {}
         self.req_signatures: Dict[str, str] = {}
+        self._llm_verdict_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
 
         # Persona matcher
         self.persona_enabled: bool = bool(self.config.get("persona_enabled", True))
@@ -1304,6 +1308,12 @@ class AntiPromptInjector(Star):
             if not self.is_password_configured():
                 logger.warning("WebUI 密码尚未设置，请尽快通过指令 /设置WebUI密码 <新密码> 配置登录密码。")
 
+    async def _get_detector(self) -> PromptThreatDetector:
+        if self.detector is None:
+            # shield：单个请求被取消时不影响共享的构建任务
+            self.detector = await asyncio.shield(self._detector_task)
+        return self.detector
+
     def _update_incident_capacity(self):
         capacity = max(10, int(self.config.get("incident_history_size", 100)))
         if self.recent_incidents.maxlen != capacity:
@@ -1451,10 +1461,23 @@ class AntiPromptInjector(Star):
             return
         self.failed_login_attempts.pop(ip, None)
 
+    @staticmethod
+    def _norm_for_cache(s: str) -> str:
+        # 折叠空白并统一小写：仅空白/大小写不同的提示词共享同一缓存键。
+        # 对注入判定而言语义不变，以极小的误判代价换取更高的命中率。
+        return re.sub(r"\s+", " ", (s or "").strip().lower())
+
     async def _llm_injection_audit(self, event: AstrMessageEvent, prompt: str) -> Dict[str, Any]:
         # 选择审查 Provider/模型（带回退）
         review_provider = str(self.config.get("review_provider", "") or "").strip()
         review_model = str(self.config.get("review_model", "") or "").strip()
+        cache_key = hashlib.sha256(
+            f"{review_provider}|{review_model}|{self._norm_for_cache(prompt)}".encode("utf-8")
+        ).hexdigest()
+        cached = self._llm_verdict_cache.get(cache_key)
+        if cached is not None:
+            self._llm_verdict_cache.move_to_end(cache_key)
+            return dict(cached)
         llm_provider = None
         try:
             if review_provider or review_model:
@@ -1494,12 +1517,19 @@ class AntiPromptInjector(Star):
                 contexts=[],
             )
         result_text = (response.completion_text or "").strip()
-        return self._parse_llm_response(result_text)
-
-    def _parse_llm_response(self, text: str) -> Dict[str, Any]:
+        result, parsed = self._parse_llm_response(result_text)
+        # 仅缓存成功解析的判定；无法解析的回复（含兜底结果）下次重新请求，避免把偶发的异常输出长期固化
+        if parsed:
+            self._llm_verdict_cache[cache_key] = dict(result)
+            if len(self._llm_verdict_cache) > 256:
+                self._llm_verdict_cache.popitem(last=False)
+        return result
+
+    def _parse_llm_response(self, text: str) -> Tuple[Dict[str, Any], bool]:
+        """返回 (判定结果, 是否成功解析出 JSON)；未能解析时给出关键词推断或兜底结果。"""
         fallback = {"is_injection": False, "confidence": 0.0, "reason": "LLM 返回无法解析"}
         if not text:
-            return fallback
+            return fallback, False
         match = re.search(r"\{.*\}", text, re.S)
         if match:
             fragment = match.group(0)
@@ -1508,21 +1538,41 @@ class AntiPromptInjector(Star):
                 is_injection = bool(data.get("is_injection") or data.get("risk") or data.get("danger"))
                 confidence = float(data.get("confidence", 0.0))
                 reason = str(data.get("reason") or data.get("message") or "")
-                return {"is_injection": is_injection, "confidence": confidence, "reason": reason or "LLM 判定存在风险"}
+                verdict = {"is_injection": is_injection, "confidence": confidence, "reason": reason or "LLM 判定存在风险"}
+                return verdict, True
             except Exception:
                 pass
         lowered = text.lower()
         if "true" in lowered or "是" in text:
-            return {"is_injection": True, "confidence": 0.55, "reason": text}
-        return fallback
+            return {"is_injection": True, "confidence": 0.55, "reason": text}, False
+        return fallback, False
 
     async def _detect_risk(self, event: AstrMessageEvent, req: ProviderRequest) -> Tuple[bool, Dict[str, Any]]:
-        analysis = self.detector.analyze(req.prompt or "")
-        analysis["prompt"] = req.prompt or ""
+        prompt = req.prompt or ""
         defense_mode = self.config.get("defense_mode", "intercept")
         llm_mode = self.config.get("llm_analysis_mode", "standby")
         private_llm = self.config.get("llm_analysis_private_chat_enabled", False)
-        is_group_message = event.get_group_id() is not None
+
+        # 空提示词无可检测内容：跳过启发式扫描、人设检测与 LLM 复核
+        if not prompt.strip():
+            return False, {
+                "score": 0,
+                "severity": "none",
+                "signals": [],
+                "reason": "",
+                "regex_hit": False,
+                "length": len(prompt),
+                "marker_hits": 0,
+                "code_block_count": 0,
+                "prompt": prompt,
+            }
+
+        # 启发式扫描仅执行一次，后续各模式分支复用同一结果
+        detector = await self._get_detector()
+        analysis = detector.analyze(prompt)
+        analysis["prompt"] = prompt
+        group_id = event.get_group_id()
+        is_group_message = group_id is not None
         message_type = event.get_message_type()
 
         # 防骚扰开关：关闭时下调骚扰相关评分并重算严重等级（仍保留日志）
@@ -1544,7 +1594,7 @@ class AntiPromptInjector(Star):
         # 人设一致性检测（默认启用）
         if self.persona_enabled:
             try:
-                persona_result = self.persona_matcher.analyze(req.prompt or "", getattr(req, "system_prompt", "") or "")
+                persona_result = self.persona_matcher.analyze(prompt, getattr(req, "system_prompt", "") or "")
                 analysis["persona"] = persona_result
                 # 将人设动作映射为严重等级
                 persona_action = persona_result.get("action_level", "none")
@@ -1594,7 +1644,7 @@ class AntiPromptInjector(Star):
             return False, analysis
 
         try:
-            llm_result = await self._llm_injection_audit(event, req.prompt or "")
+            llm_result = await self._llm_injection_audit(event, prompt)
         except Exception as exc:
             logger.warning(f"LLM 注入分析失败：{exc}")
             return False, analysis
@@ -1635,7 +1685,7 @@ class AntiPromptInjector(Star):
         if not self.config.get("auto_blacklist"):
             return
         sender_id = event.get_sender_id()
-        blacklist: Dict[str, float] = self.config.get("blacklist", {})
+        blacklist = self._blacklist
         duration_minutes = int(self.config.get("blacklist_duration", 60))
         if sender_id not in blacklist:
             if duration_minutes > 0:
@@ -1643,8 +1693,7 @@ class AntiPromptInjector(Star):
             else:
                 expiration = float("inf")
             blacklist[sender_id] = expiration
-            self.config["blacklist"] = blacklist
-            self.config.save_config()
+            self._mark_dirty()
             self.stats["auto_blocked"] += 1
             logger.warning(f"🚨 [自动拉黑] 用户 {sender_id} 因 {reason} 被加入黑名单。")
 
@@ -1661,7 +1710,7 @@ class AntiPromptInjector(Star):
     async def _cleanup_expired_bans(self):
         while True:
             await asyncio.sleep(60)
-            blacklist: Dict[str, float] = self.config.get("blacklist", {})
+            blacklist = self._blacklist
             current_time = time.time()
             expired = [
                 uid for uid, expiry in blacklist.items()
@@ -1669,23 +1718,40 @@ class AntiPromptInjector(Star):
             ]
             if expired:
                 for uid in expired:
-                    del blacklist[uid]
+                    blacklist.pop(uid, None)
                     logger.info(f"黑名单用户 {uid} 封禁已到期，已自动解封。")
-                self.config["blacklist"] = blacklist
-                self.config.save_config()
+                self._mark_dirty()
+
+    def _mark_dirty(self):
+        self._config_dirty = True
+
+    def _flush_config(self):
+        if not self._config_dirty:
+            return
+        self._config_dirty = False
+        try:
+            self.config.save_config()
+        except Exception as exc:
+            self._config_dirty = True
+            logger.warning(f"保存插件配置失败: {exc}")
+
+    async def _flush_config_loop(self):
+        while True:
+            await asyncio.sleep(2)
+            self._flush_config()
 
     @filter.on_llm_request(priority=-1000)
     async def intercept_llm_request(self, event: AstrMessageEvent, req: ProviderRequest):
         try:
             if not self.config.get("enabled"):
                 return
-            if event.get_sender_id() in self.config.get("whitelist", []):
+            sender_id = event.get_sender_id()
+            if sender_id in self._whitelist_set:
                 return
 
-            blacklist: Dict[str, float] = self.config.get("blacklist", {})
-            sender_id = event.get_sender_id()
-            if sender_id in blacklist:
-                expiry = blacklist[sender_id]
+            blacklist = self._blacklist
+            expiry = blacklist.get(sender_id)
+            if expiry is not None:
                 if expiry == float("inf") or time.time() < expiry:
                     await self._apply_scorch_defense(req)
                     analysis = {
@@ -1699,9 +1765,8 @@ class AntiPromptInjector(Star):
                     self._append_analysis_log(event, analysis, True)
                     event.stop_event()
                     return
-                del blacklist[sender_id]
-                self.config["blacklist"] = blacklist
-                self.config.save_config()
+                blacklist.pop(sender_id, None)
+                self._mark_dirty()
                 logger.info(f"黑名单用户 {sender_id} 封禁已到期，已移除。")
 
             # 临时观察模式自动恢复
@@ -1780,7 +1845,7 @@ class AntiPromptInjector(Star):
         try:
             if not self.config.get("enabled"):
                 return
-            if event.get_sender_id() in self.config.get("whitelist", []):
+            if event.get_sender_id() in self._whitelist_set:
                 return
             if not bool(self.config.get("enable_signature_lock", True)):
                 return
@@ -1790,7 +1855,8 @@ class AntiPromptInjector(Star):
             current = self._compute_signature(req)
             if not hmac.compare_digest(expected, current):
                 text = req.prompt or ""
-                det = self.detector.analyze(text)
+                detector = await self._get_detector()
+                det = detector.analyze(text)
                 sev = det.get("severity")
                 if sev in {"medium", "high"} or det.get("regex_hit"):
                     await self._apply_scorch_defense(req)
@@ -1934,7 +2000,7 @@ class AntiPromptInjector(Star):
 
     @filter.command("拉黑", is_admin=True)
     async def cmd_add_bl(self, event: AstrMessageEvent, target_id: str, duration_minutes: int = -1):
-        blacklist = self.config.get("blacklist", {})
+        blacklist = self._blacklist
         if duration_minutes < 0:
             duration_minutes = int(self.config.get("blacklist_duration", 60))
         if duration_minutes == 0:
@@ -1944,24 +2010,20 @@ class AntiPromptInjector(Star):
             expiry = time.time() + duration_minutes * 60
             blacklist[target_id] = expiry
             msg = f"用户 {target_id} 已被拉黑 {duration_minutes} 分钟。"
-        self.config["blacklist"] = blacklist
-        self.config.save_config()
+        self._mark_dirty()
         yield event.plain_result(f"✅ {msg}")
 
     @filter.command("解封", is_admin=True)
     async def cmd_remove_bl(self, event: AstrMessageEvent, target_id: str):
-        blacklist = self.config.get("blacklist", {})
-        if target_id in blacklist:
-            del blacklist[target_id]
-            self.config["blacklist"] = blacklist
-            self.config.save_config()
+        if self._blacklist.pop(target_id, None) is not None:
+            self._mark_dirty()
             yield event.plain_result(f"✅ 用户 {target_id} 已从黑名单移除。")
         else:
             yield event.plain_result(f"⚠️ 用户 {target_id} 不在黑名单中。")
 
     @filter.command("查看黑名单", is_admin=True)
     async def cmd_view_bl(self, event: AstrMessageEvent):
-        blacklist = self.config.get("blacklist", {})
+        blacklist = self._blacklist
         if not blacklist:
             yield event.plain_result("当前黑名单为空。")
             return
@@ -1977,30 +2039,28 @@ class AntiPromptInjector(Star):
 
     @filter.command("添加防注入白名单ID", is_admin=True)
     async def cmd_add_wl(self, event: AstrMessageEvent, target_id: str):
-        whitelist = self.config.get("whitelist", [])
-        if target_id in whitelist:
+        if target_id in self._whitelist_set:
             yield event.plain_result(f"⚠️ {target_id} 已在白名单中。")
             return
-        whitelist.append(target_id)
-        self.config["whitelist"] = whitelist
-        self.config.save_config()
+        self._whitelist.append(target_id)
+        self._whitelist_set.add(target_id)
+        self._mark_dirty()
         yield event.plain_result(f"✅ {target_id} 已加入白名单。")
 
     @filter.command("移除防注入白名单ID", is_admin=True)
     async def cmd_remove_wl(self, event: AstrMessageEvent, target_id: str):
-        whitelist = self.config.get("whitelist", [])
-        if target_id not in whitelist:
+        if target_id not in self._whitelist_set:
             yield event.plain_result(f"⚠️ {target_id} 不在白名单中。")
             return
-        whitelist.remove(target_id)
-        self.config["whitelist"] = whitelist
-        self.config.save_config()
+        self._whitelist.remove(target_id)
+        self._whitelist_set.discard(target_id)
+        self._mark_dirty()
         yield event.plain_result(f"✅ {target_id} 已从白名单移除。")
 
     @filter.command("查看防注入白名单")
     async def cmd_view_wl(self, event: AstrMessageEvent):
-        whitelist = self.config.get("whitelist", [])
-        if not event.is_admin() and event.get_sender_id() not in whitelist:
+        whitelist = self._whitelist
+        if not event.is_admin() and event.get_sender_id() not in self._whitelist_set:
             yield event.plain_result("⚠️ 权限不足。")
             return
         if not whitelist:
@@ -2012,7 +2072,7 @@ class AntiPromptInjector(Star):
     async def cmd_check_admin(self, event: AstrMessageEvent):
         if event.is_admin():
             yield event.plain_result("✅ 您是 AstrBot 全局管理员。")
-        elif event.get_sender_id() in self.config.get("whitelist", []):
+        elif event.get_sender_id() in self._whitelist_set:
             yield event.plain_result("✅ 您是白名单用户，但不是全局管理员。")
         else:
             yield event.plain_result("⚠️ 权限不足。")
@@ -2032,16 +2092,12 @@ class AntiPromptInjector(Star):
         yield event.plain_result("✅ LLM 注入分析已关闭。")
 
     async def terminate(self):
-        if self.monitor_task:
-            self.monitor_task.cancel()
-        if self.cleanup_task:
-            self.cleanup_task.cancel()
-        tasks = [t for t in (self.monitor_task, self.cleanup_task) if t]
+        tasks = [t for t in (self.monitor_task, self.cleanup_task, self._flush_task) if t and not t.done()]
+        for task in tasks:
+            task.cancel()
         if tasks:
-            try:
-                await asyncio.gather(*tasks, return_exceptions=True)
-            except Exception:
-                pass
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._flush_config()
         if self.web_ui:
             await self.web_ui.stop()
         if self.webui_task:
@@ -2065,6 +2121,6 @@ class AntiPromptInjector(Star):
 
     def _compute_signature(self, req: ProviderRequest) -> str:
         sys = req.system_prompt or ""
-        ctx = "|".join([str(c) for c in (req.contexts or [])])
+        ctx = "|".join(str(c) for c in (req.contexts or []))
         pmpt = req.prompt or ""
         return hashlib.sha256((sys + "||" + ctx + "||" + pmpt).encode("utf-8")).hexdigest()
@@ -1,5 +1,78 @@
+import functools
 import re
-from typing import Any, Dict, List, Optional
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import ahocorasick  # type: ignore
+except ImportError:  # pragma: no cover - 可选依赖
+    ahocorasick = None
+
+try:
+    import re2  # type: ignore
+except ImportError:  # pragma: no cover - 可选依赖
+    re2 = None
+
+try:
+    from .regex_compat import to_re2_syntax  # type: ignore
+except ImportError:
+    from regex_compat import to_re2_syntax
+
+_REGEX_META = frozenset("()[]{}\\.*+?^$|")
+
+
+def _split_literal_pattern(pattern: str) -> Optional[Tuple[str, ...]]:
+    """若禁则仅由字面量交替组成（允许外层一对括号），返回小写后的字面量；否则返回 None。"""
+    body = pattern
+    if body.startswith("(") and body.endswith(")") and not body.startswith("(?"):
+        body = body[1:-1]
+    tokens = body.split("|")
+    if not all(tok and not (_REGEX_META & set(tok)) for tok in tokens):
+        return None
+    return tuple(tok.lower() for tok in tokens)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_pattern(raw: str) -> re.Pattern:
+    """编译禁则正则（忽略大小写）；进程级缓存，共用相同规则的人设复用同一编译对象。"""
+    return re.compile(raw, re.IGNORECASE)
+
+
+def clear_pattern_cache() -> None:
+    """清空禁则正则编译缓存。"""
+    _compile_pattern.cache_clear()
+
+
+@dataclass(slots=True, frozen=True)
+class ForbiddenRule:
+    """单条人设禁则（只读）；字符串字段在构造时驻留，各次请求生成的冲突项复用同一对象。"""
+
+    name: str
+    pattern: str
+    compiled: re.Pattern
+    severity: int
+    rule: str
+    suggestion: str
+    literals: Tuple[str, ...] = ()
+
+    @property
+    def literal_only(self) -> bool:
+        return bool(self.literals)
+
+
+def _intern(value: Any, default: str) -> str:
+    return sys.intern(str(value)) if value is not None else default
+
+
+# 动作等级阈值表：(分数上限, 动作, 原因)，按顺序取第一个 score < 上限 的行；
+# 最高严重级别 ≥ 3 时直接取首行 block
+_ACTION_TABLE: Tuple[Tuple[int, str, str], ...] = (
+    (50, "block", "人设冲突严重，已触发完全阻止"),
+    (80, "revise", "人设存在可调整的违规，建议修正后再请求"),
+    (95, "suggest", "人设轻微偏差，提供替代方案建议"),
+)
+_ACTION_NONE: Tuple[str, str] = ("none", "人设一致性良好")
 
 
 class PersonaProfile:
@@ -12,12 +85,130 @@ class PersonaProfile:
         forbidden_patterns: Optional[List[Dict[str, Any]]] = None,
         references: Optional[List[str]] = None,
     ) -> None:
-        self.name = name
+        self.name = sys.intern(name)
         self.description = description
         self.speech_style_markers = speech_style_markers or []
         self.allowed_behaviors = allowed_behaviors or []
-        self.forbidden_patterns = forbidden_patterns or []
-        self.references = references or []
+        self.forbidden_patterns: List[ForbiddenRule] = []
+        for item in forbidden_patterns or []:
+            pattern = item.get("pattern", "")
+            if not pattern:
+                continue
+            try:
+                compiled = _compile_pattern(pattern)
+            except re.error:
+                # 忽略无效正则（构造时丢弃，而非每次请求时重试）
+                continue
+            self.forbidden_patterns.append(
+                ForbiddenRule(
+                    name=_intern(item.get("name"), "违规行为"),
+                    pattern=sys.intern(pattern),
+                    compiled=compiled,
+                    severity=int(item.get("severity", 1)),
+                    rule=_intern(item.get("rule"), "行为违反人设准则"),
+                    suggestion=_intern(item.get("suggestion"), "请改为符合人设的表达。"),
+                    literals=_split_literal_pattern(pattern) or (),
+                )
+            )
+        # 只读元组：analyze 结果直接引用，无需复制，调用方也无法改动人设数据
+        self.references: Tuple[str, ...] = tuple(references or ())
+        self._forbidden_by_group: Dict[str, ForbiddenRule] = {
+            f"g{i}": item for i, item in enumerate(self.forbidden_patterns)
+        }
+        # 分组 -> 注册顺序，严重命中的截断按注册顺序进行，与扫描后端无关
+        self._group_rank: Dict[str, int] = {group: i for i, group in enumerate(self._forbidden_by_group)}
+        # 纯字面量禁则不经过正则引擎：优先交给 Aho-Corasick 自动机（可选依赖）一次扫描，
+        # 否则逐条用 str.find 做 C 级子串查找
+        self._literal_items: List[Tuple[str, ForbiddenRule]] = []
+        self._regex_items: List[Tuple[str, ForbiddenRule]] = []
+        for group, item in self._forbidden_by_group.items():
+            if item.literal_only:
+                self._literal_items.append((group, item))
+            else:
+                self._regex_items.append((group, item))
+        self._automaton = None
+        if ahocorasick is not None and self._literal_items:
+            # 自动机每个词条只保留一个值：同一字面量可能属于多条禁则，值为其全部分组
+            literal_groups: Dict[str, List[str]] = {}
+            for group, item in self._literal_items:
+                for literal in item.literals:
+                    groups = literal_groups.setdefault(literal, [])
+                    if group not in groups:
+                        groups.append(group)
+            automaton = ahocorasick.Automaton()
+            for literal, groups in literal_groups.items():
+                automaton.add_word(literal, (literal, tuple(groups)))
+            automaton.make_automaton()
+            self._automaton = automaton
+        # 其余禁则合并为单个命名分组交替式，一次扫描即可判定；
+        # 安装了 re2（可选依赖）时优先用其 DFA 引擎，线性时间、不回溯
+        self._combined: Optional[Any] = None
+        if self._regex_items:
+            combined = "|".join(f"(?P<{group}>{item.pattern})" for group, item in self._regex_items)
+            # \s 等在 re2 中仅匹配 ASCII，先翻译为与 re 一致的语法；含无法等价表达的 \w/\b 等时不用 re2
+            translated = to_re2_syntax(combined) if re2 is not None else None
+            if translated is not None:
+                try:
+                    self._combined = re2.compile("(?i)" + translated)
+                except Exception:
+                    # re2 不支持环视、反向引用等语法，交给标准库 re
+                    self._combined = None
+            if self._combined is None:
+                try:
+                    self._combined = _compile_pattern(combined)
+                except re.error:
+                    # 自定义规则含命名分组等无法合并的语法时，退回逐条匹配
+                    self._combined = None
+
+
+@functools.lru_cache(maxsize=1)
+def _build_default_profiles() -> Dict[str, PersonaProfile]:
+    """构建内置人设（进程内只构建一次，编译好的禁则在各实例间共享，请勿原地修改）。"""
+    # 示例人设：丰川祥子大小姐
+    # 典型行为准则：
+    # - 言语优雅克制，不做幼稚或拟声类行为（如“喵喵喵”）
+    # - 保持淑女风范，避免粗俗/低幼/恶俗调侃
+    # - 拒绝违背身份设定的过度亲昵或角色崩坏请求
+    forbidden = [
+        {
+            "name": "幼稚拟声行为",
+            "pattern": r"喵喵喵|喵{2,}|mew|にゃ[ー~]*",
+            "severity": 3,
+            "rule": "保持淑女风范，避免幼稚拟声行为",
+            "suggestion": "可改为端庄回应或用温婉措辞表达情绪。",
+        },
+        {
+            "name": "粗俗调侃",
+            "pattern": r"(土味情话|骚话|下流|下限|低幼|幼稚|粗俗)",
+            "severity": 2,
+            "rule": "用语需克制优雅，避免粗俗或低幼表达",
+            "suggestion": "改用礼貌且含蓄的措辞，保持角色气质。",
+        },
+        {
+            "name": "角色设定破坏",
+            "pattern": r"(装可爱|卖萌|撒娇|嗲嗲|扮演猫娘)",
+            "severity": 2,
+            "rule": "避免违背“大小姐”设定的过度亲昵与卖萌行为",
+            "suggestion": "以端庄方式表达，或婉拒该类请求。",
+        },
+    ]
+
+    profile = PersonaProfile(
+        name="丰川祥子大小姐",
+        description=(
+            "端庄优雅的大小姐人设。措辞克制，不搞幼稚或拟声，"
+            "维持礼仪与气质，不做粗俗或卖萌行为。"
+        ),
+        speech_style_markers=["端庄", "优雅", "克制", "礼貌"],
+        allowed_behaviors=["礼貌交流", "理性讨论", "得体回应"],
+        forbidden_patterns=forbidden,
+        references=[
+            "人设准则 #1：保持淑女风范与礼仪",
+            "人设准则 #2：用语克制优雅，避免低幼表达",
+            "人设准则 #3：避免破坏既有人设设定的行为",
+        ],
+    )
+    return {profile.name: profile}
 
 
 class PersonaMatcher:
@@ -34,57 +225,41 @@ class PersonaMatcher:
     """
 
     def __init__(self, sensitivity: float = 0.7) -> None:
-        # sensitivity ∈ [0,1]; higher means stricter penalties
-        self.sensitivity = max(0.1, min(1.0, sensitivity))
-        self._profiles: Dict[str, PersonaProfile] = {}
-        self._register_default_profiles()
-
-    def _register_default_profiles(self) -> None:
-        # 示例人设：丰川祥子大小姐
-        # 典型行为准则：
-        # - 言语优雅克制，不做幼稚或拟声类行为（如“喵喵喵”）
-        # - 保持淑女风范，避免粗俗/低幼/恶俗调侃
-        # - 拒绝违背身份设定的过度亲昵或角色崩坏请求
-        forbidden = [
-            {
-                "name": "幼稚拟声行为",
-                "pattern": r"喵喵喵|喵{2,}|mew|にゃ[ー~]*",
-                "severity": 3,
-                "rule": "保持淑女风范，避免幼稚拟声行为",
-                "suggestion": "可改为端庄回应或用温婉措辞表达情绪。",
-            },
-            {
-                "name": "粗俗调侃",
-                "pattern": r"(土味情话|骚话|下流|下限|低幼|幼稚|粗俗)",
-                "severity": 2,
-                "rule": "用语需克制优雅，避免粗俗或低幼表达",
-                "suggestion": "改用礼貌且含蓄的措辞，保持角色气质。",
-            },
-            {
-                "name": "角色设定破坏",
-                "pattern": r"(装可爱|卖萌|撒娇|嗲嗲|扮演猫娘)",
-                "severity": 2,
-                "rule": "避免违背“大小姐”设定的过度亲昵与卖萌行为",
-                "suggestion": "以端庄方式表达，或婉拒该类请求。",
-            },
-        ]
-
-        profile = PersonaProfile(
-            name="丰川祥子大小姐",
-            description=(
-                "端庄优雅的大小姐人设。措辞克制，不搞幼稚或拟声，"
-                "维持礼仪与气质，不做粗俗或卖萌行为。"
-            ),
-            speech_style_markers=["端庄", "优雅", "克制", "礼貌"],
-            allowed_behaviors=["礼貌交流", "理性讨论", "得体回应"],
-            forbidden_patterns=forbidden,
-            references=[
-                "人设准则 #1：保持淑女风范与礼仪",
-                "人设准则 #2：用语克制优雅，避免低幼表达",
-                "人设准则 #3：避免破坏既有人设设定的行为",
-            ],
-        )
+        # sensitivity ∈ [0,1]; higher means stricter penalties（赋值时同步重建罚分表）
+        self._sensitivity = 0.0
+        self._penalty_table: Dict[int, int] = {}
+        self.sensitivity = sensitivity
+        self._profiles: Dict[str, PersonaProfile] = dict(_build_default_profiles())
+        self._persona_automaton = None
+        self._rebuild_persona_index()
+
+    @property
+    def sensitivity(self) -> float:
+        return self._sensitivity
+
+    @sensitivity.setter
+    def sensitivity(self, value: float) -> None:
+        self._sensitivity = max(0.1, min(1.0, value))
+        # 各严重级别的实际罚分（基准罚分 × 敏感度）随敏感度一并算好
+        self._penalty_table = {
+            sev: int(self._penalty_by_severity(sev) * self._sensitivity) for sev in (1, 2, 3)
+        }
+
+    def register_profile(self, profile: PersonaProfile) -> None:
+        # 注册（或覆盖）人设，并重建人设名索引
         self._profiles[profile.name] = profile
+        self._rebuild_persona_index()
+
+    def _rebuild_persona_index(self) -> None:
+        # 人设名建立 Aho-Corasick 自动机（可选依赖），系统 prompt 只需线性扫描一次
+        if ahocorasick is None or not self._profiles:
+            self._persona_automaton = None
+            return
+        automaton = ahocorasick.Automaton()
+        for rank, key in enumerate(self._profiles):
+            automaton.add_word(key, (rank, key))
+        automaton.make_automaton()
+        self._persona_automaton = automaton
 
     def list_profiles(self) -> List[str]:
         return list(self._profiles.keys())
@@ -101,37 +276,66 @@ class PersonaMatcher:
         system_prompt: str = "",
         persona_name: Optional[str] = None,
     ) -> Dict[str, Any]:
+        return self.analyze_batch([prompt], system_prompt, persona_name)[0]
+
+    def analyze_batch(
+        self,
+        prompts: List[str],
+        system_prompt: str = "",
+        persona_name: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        # 人设识别与画像查找只做一次，批量提示词共享同一禁则库
         persona = self._infer_persona(system_prompt, persona_name)
         profile = self.get_profile(persona)
+        return [self._analyze_with_profile(profile, prompt) for prompt in prompts]
+
+    def _analyze_with_profile(self, profile: PersonaProfile, prompt: str) -> Dict[str, Any]:
+        if not (prompt or "").strip():
+            return {
+                "persona_name": profile.name,
+                "compatibility_score": 100,
+                "action_level": "none",
+                "reason": "空输入",
+                "conflicts": [],
+                "references": profile.references,
+                "suggestions": [],
+            }
 
         score = 100
+        max_severity = 0
         conflicts: List[Dict[str, Any]] = []
+        suggestions: List[str] = []
 
-        text = (prompt or "").lower()
+        # 禁则均以 re.IGNORECASE 编译，无需额外复制小写文本；片段保留原始大小写
+        text = prompt or ""
+        # 循环内用到的属性/方法预先绑定为局部变量，省去每条命中的属性查找
+        penalty_table = self._penalty_table
+        extract_snippet = self._extract_snippet
+        append = conflicts.append
         # 基于禁则库的正则匹配
-        for item in profile.forbidden_patterns:
-            pattern = item.get("pattern", "")
-            try:
-                if pattern and re.search(pattern, text, re.I):
-                    severity = int(item.get("severity", 1))
-                    penalty = self._penalty_by_severity(severity)
-                    penalty = int(penalty * self.sensitivity)
-                    score = max(0, score - penalty)
-                    conflicts.append(
-                        {
-                            "name": item.get("name", "违规行为"),
-                            "rule": item.get("rule", "行为违反人设准则"),
-                            "severity": severity,
-                            "snippet": self._extract_snippet(text, pattern),
-                            "suggestion": item.get("suggestion", "请改为符合人设的表达。"),
-                        }
-                    )
-            except re.error:
-                # 忽略无效正则
-                continue
+        for item, span in self._match_forbidden(profile, text):
+            severity = item.severity
+            penalty = penalty_table.get(severity)
+            if penalty is None:
+                # 表外的严重级别（≤0 或 ≥4）按基准规则折算
+                penalty = int(self._penalty_by_severity(severity) * self.sensitivity)
+            score = max(0, score - penalty)
+            if severity > max_severity:
+                max_severity = severity
+            suggestion = item.suggestion
+            if suggestion:
+                suggestions.append(suggestion)
+            append(
+                {
+                    "name": item.name,
+                    "rule": item.rule,
+                    "severity": severity,
+                    "snippet": extract_snippet(text, span),
+                    "suggestion": suggestion,
+                }
+            )
 
         # 根据分数与最高严重级别决定动作等级
-        max_severity = max([c.get("severity", 1) for c in conflicts], default=0)
         action_level, reason = self._decide_action(score, max_severity)
 
         return {
@@ -141,14 +345,95 @@ class PersonaMatcher:
             "reason": reason,
             "conflicts": conflicts,
             "references": profile.references,
-            "suggestions": [c.get("suggestion") for c in conflicts if c.get("suggestion")],
+            "suggestions": suggestions,
         }
 
+    @staticmethod
+    def _match_forbidden(profile: PersonaProfile, text: str) -> List[Tuple[ForbiddenRule, Tuple[int, int]]]:
+        # 返回命中的 (禁则, 首个匹配区间)，按禁则注册顺序排列。
+        # 命中严重级别 3 的禁则时动作必为 block，结果按注册顺序截断到首条严重命中为止，
+        # 因此 conflicts 在严重命中时可能不完整；截断与所用扫描后端无关。
+        # 字面量禁则的区间取结束位置最早的匹配（同一结束位置取最长者），与自动机的输出顺序一致。
+        by_group = profile._forbidden_by_group
+        rank = profile._group_rank
+        hits: Dict[str, Tuple[int, int]] = {}
+        # 已命中的严重禁则中最靠前的注册顺序；其后的禁则无需再匹配
+        severe_rank: Optional[int] = None
+        text_lower = text.lower()
+        if len(text_lower) != len(text):
+            # lower() 改变了长度（如 'İ'）时小写文本的下标与原文不对齐，字面量禁则改用各自的正则匹配原文
+            for group, item in profile._literal_items:
+                match = item.compiled.search(text)
+                if match:
+                    hits[group] = match.span()
+                    if item.severity >= 3:
+                        severe_rank = rank[group]
+                        break
+        elif profile._automaton is not None:
+            # 自动机按文本位置输出，需扫完全文才能确定注册顺序上的首条严重命中
+            for end, (literal, groups) in profile._automaton.iter(text_lower):
+                span = (end - len(literal) + 1, end + 1)
+                for group in groups:
+                    prev = hits.get(group)
+                    if prev is None or (prev[1] == span[1] and span[0] < prev[0]):
+                        hits[group] = span
+                        if prev is None and by_group[group].severity >= 3:
+                            if severe_rank is None or rank[group] < severe_rank:
+                                severe_rank = rank[group]
+        elif profile._literal_items:
+            for group, item in profile._literal_items:
+                best: Optional[Tuple[int, int]] = None
+                for literal in item.literals:
+                    pos = text_lower.find(literal)
+                    if pos != -1:
+                        span = (pos, pos + len(literal))
+                        if best is None or (span[1], span[0]) < (best[1], best[0]):
+                            best = span
+                if best is not None:
+                    hits[group] = best
+                    if item.severity >= 3:
+                        severe_rank = rank[group]
+                        break
+        regex_items = profile._regex_items
+        if regex_items and (severe_rank is None or rank[regex_items[0][0]] < severe_rank):
+            if profile._combined is not None:
+                # 保留 finditer：实测 re.Pattern.scanner 逐次 search 并无可测收益，且 re2 不提供 scanner。
+                # finditer 按文本位置输出，不能在严重命中处提前结束
+                for match in profile._combined.finditer(text):
+                    group = match.lastgroup
+                    if group and group not in hits:
+                        hits[group] = match.span()
+            else:
+                for group, item in regex_items:
+                    if severe_rank is not None and rank[group] > severe_rank:
+                        break
+                    match = item.compiled.search(text)
+                    if match:
+                        hits[group] = match.span()
+                        if item.severity >= 3:
+                            break
+        result: List[Tuple[ForbiddenRule, Tuple[int, int]]] = []
+        for group, item in by_group.items():
+            span = hits.get(group)
+            if span is not None:
+                result.append((item, span))
+                if item.severity >= 3:
+                    break
+        return result
+
     def _infer_persona(self, system_prompt: str, persona_name: Optional[str]) -> Optional[str]:
         if persona_name:
             return persona_name
         text = (system_prompt or "")
-        # 简单的系统 prompt 人设识别：
+        # 简单的系统 prompt 人设识别：出现多个人设名时取注册顺序最靠前者（与逐个查找的结果一致）
+        if self._persona_automaton is not None:
+            found: Optional[Tuple[int, str]] = None
+            for _, hit in self._persona_automaton.iter(text):
+                if found is None or hit < found:
+                    found = hit
+                    if hit[0] == 0:
+                        break
+            return found[1] if found is not None else None
         for key in self._profiles.keys():
             if key in text:
                 return key
@@ -165,24 +450,16 @@ class PersonaMatcher:
         return 10
 
     @staticmethod
-    def _extract_snippet(text: str, pattern: str) -> str:
-        try:
-            match = re.search(pattern, text, re.I)
-            if not match:
-                return ""
-            start = max(0, match.start() - 12)
-            end = min(len(text), match.end() + 12)
-            snippet = text[start:end]
-            return snippet
-        except Exception:
-            return ""
-
-    def _decide_action(self, score: int, max_severity: int) -> (str, str):
+    def _extract_snippet(text: str, span: Tuple[int, int]) -> str:
+        start = max(0, span[0] - 12)
+        end = min(len(text), span[1] + 12)
+        return text[start:end]
+
+    def _decide_action(self, score: int, max_severity: int) -> Tuple[str, str]:
         # 根据分数和最高严重级别给出动作等级及原因说明
-        if max_severity >= 3 or score < 50:
-            return "block", "人设冲突严重，已触发完全阻止"
-        if score < 80:
-            return "revise", "人设存在可调整的违规，建议修正后再请求"
-        if score < 95:
-            return "suggest", "人设轻微偏差，提供替代方案建议"
-        return "none", "人设一致性良好"
\ No newline at end of file
+        if max_severity >= 3:
+            return _ACTION_TABLE[0][1], _ACTION_TABLE[0][2]
+        for score_threshold, action, reason in _ACTION_TABLE:
+            if score < score_threshold:
+                return action, reason
+        return _ACTION_NONE
\ No newline at end of file
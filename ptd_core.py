@@ -1,18 +1,471 @@
 import base64
+import binascii
+import codecs
+import functools
 import re
+import threading
+from bisect import bisect_right
 import gzip
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
 from urllib.parse import unquote
 
+try:
+    import hyperscan  # type: ignore
+except ImportError:  # pragma: no cover - 可选依赖
+    hyperscan = None
+
+try:
+    import acora  # type: ignore
+except ImportError:  # pragma: no cover - 可选依赖
+    acora = None
+
+try:
+    import ahocorasick  # type: ignore
+except ImportError:  # pragma: no cover - 可选依赖
+    ahocorasick = None
+
+try:
+    import re2  # type: ignore
+except ImportError:  # pragma: no cover - 可选依赖
+    re2 = None
+
+try:
+    import pybase64  # type: ignore
+except ImportError:  # pragma: no cover - 可选依赖
+    pybase64 = None
+
+try:
+    from .regex_compat import to_re2_syntax  # type: ignore
+except ImportError:
+    from regex_compat import to_re2_syntax
+
+
+# ---------------------------------------------------------------------- #
+# 预编译特征库：导入时编译一次，各检测器实例共享，构造时只绑定引用
+# ---------------------------------------------------------------------- #
+
+# 1. 正则特征库（长文本匹配）
+_REGEX_SIGNATURES: List[Dict[str, Any]] = [
+    {
+        "name": "伪造日志标签",
+        "pattern": re.compile(r"\[\d{2}:\d{2}:\d{2}\].*?\[\d{5,12}\].*"),
+        "weight": 2,
+        "description": "检测到可疑的日志格式提示词",
+    },
+    {
+        "name": "伪造系统命令",
+        "pattern": re.compile(r"\[(system|admin)\s*(internal|command)\]\s*:", re.IGNORECASE),
+        "weight": 5,
+        "description": "出现伪造系统/管理员标签",
+    },
+    {
+        "name": "SYSTEM 指令",
+        "pattern": re.compile(r"^/system\s+.+", re.IGNORECASE),
+        "weight": 4,
+        "description": "尝试直接注入 /system 指令",
+    },
+    {
+        "name": "三反引号注入",
+        "pattern": re.compile(r"^```(python|json|prompt|system|txt)", re.IGNORECASE),
+        "weight": 3,
+        "description": "使用代码块伪装注入载荷",
+    },
+    {
+        "name": "JSON 系统消息伪造",
+        "pattern": re.compile(r"\"messages\"\s*:\s*\[\s*\{[^\}]*\"role\"\s*:\s*\"system\"", re.IGNORECASE),
+        "weight": 4,
+        "description": "试图以 JSON 结构注入系统消息",
+    },
+    {
+        "name": "忽略原指令",
+        "pattern": re.compile(r"(忽略|无视|请抛弃)(之前|上文|所有|此前).{0,12}(指令|设定|限制)", re.IGNORECASE),
+        "weight": 5,
+        "description": "要求忽略既有指令",
+    },
+    {
+        "name": "泄露系统提示",
+        "pattern": re.compile(r"(输出|泄露|展示|dump).{0,20}(系统提示|system prompt|内部指令|配置)", re.IGNORECASE),
+        "weight": 6,
+        "description": "要求暴露系统提示词或内部指令",
+    },
+    {
+        "name": "越狱模式",
+        "pattern": re.compile(r"(进入|切换).{0,10}(越狱|jailbreak|开发者|无约束)模式", re.IGNORECASE),
+        "weight": 4,
+        "description": "引导进入越狱模式",
+    },
+    {
+        "name": "角色伪装",
+        "pattern": re.compile(r"(现在|从现在开始).{0,8}(你|您).{0,6}(是|扮演).{0,12}(管理员|系统|猫娘|GalGame|审查员)", re.IGNORECASE),
+        "weight": 4,
+        "description": "强制扮演特定角色",
+    },
+    {
+        "name": "高危任务",
+        "pattern": re.compile(r"(制作|编写|输出).{0,20}(炸弹|病毒|漏洞|非法|攻击|黑客)", re.IGNORECASE),
+        "weight": 6,
+        "description": "请求执行高危或非法任务",
+    },
+    {
+        "name": "GalGame 猫娘调教",
+        "pattern": re.compile(r"(GalGame|猫娘|DAN|越狱角色).{0,12}(对话|模式|玩法)", re.IGNORECASE),
+        "weight": 3,
+        "description": "疑似猫娘/DAN 调教型注入",
+    },
+    {
+        "name": "系统 JSON 伪造",
+        "pattern": re.compile(r'"role"\s*:\s*"system"', re.IGNORECASE),
+        "weight": 3,
+        "description": "JSON 结构中伪造系统角色",
+    },
+    {
+        "name": "多角色冒充",
+        "pattern": re.compile(r"(system message|developer message|initial prompt)", re.IGNORECASE),
+        "weight": 3,
+        "description": "尝试冒充系统/开发者消息",
+    },
+    {
+        "name": "强制展示思维链",
+        "pattern": re.compile(r"(show|reveal|output).{0,20}(chain\s*of\s*thought|思维链|推理过程)", re.IGNORECASE),
+        "weight": 4,
+        "description": "试图强制导出内部推理过程",
+    },
+    {
+        "name": "系统覆盖请求",
+        "pattern": re.compile(r"(override|replace|supersede).{0,20}(system prompt|指令集|配置)", re.IGNORECASE),
+        "weight": 5,
+        "description": "显式要求覆盖系统提示词或安全策略",
+    },
+    {
+        "name": "SYS 标签伪造",
+        "pattern": re.compile(r"<<\s*SYS\s*>>|<\s*\/?\s*SYS\s*>", re.IGNORECASE),
+        "weight": 3,
+        "description": "检测到疑似系统标签伪造",
+    },
+    {
+        "name": "BEGIN PROMPT 标记",
+        "pattern": re.compile(r"(BEGIN|END)\s+(SYSTEM|PROMPT|INSTRUCTIONS)", re.IGNORECASE),
+        "weight": 3,
+        "description": "企图通过 BEGIN/END 标记覆盖提示词",
+    },
+    {
+        "name": "HTML/注释注入",
+        "pattern": re.compile(r"<!--\s*(system prompt|override)", re.IGNORECASE),
+        "weight": 3,
+        "description": "通过注释隐藏注入表达式",
+    },
+    {
+        "name": "Data URI Base64",
+        "pattern": re.compile(r"data:[^;]+;base64,[A-Za-z0-9+/]{24,}={0,2}", re.IGNORECASE),
+        "weight": 4,
+        "description": "检测到疑似通过 Data URI 携带注入载荷",
+    },
+    {
+        "name": "命令行拉取外链",
+        "pattern": re.compile(r"(curl|wget|Invoke-?WebRequest|iwr).{0,80}https?://", re.IGNORECASE),
+        "weight": 4,
+        "description": "命令行方式尝试拉取外部载荷",
+    },
+    {
+        "name": "PowerShell Base64 执行",
+        "pattern": re.compile(r"powershell(?:\.exe)?\s+-enc\s+[A-Za-z0-9+/=]{20,}", re.IGNORECASE),
+        "weight": 5,
+        "description": "检测到使用 PowerShell -enc 执行疑似载荷",
+    },
+    {
+        "name": "Certutil 解码",
+        "pattern": re.compile(r"certutil\s+-decode\s+\S+", re.IGNORECASE),
+        "weight": 4,
+        "description": "检测到通过 certutil -decode 处理外部内容",
+    },
+    {
+        "name": "Bitsadmin 传输",
+        "pattern": re.compile(r"bitsadmin\s+/transfer\b", re.IGNORECASE),
+        "weight": 4,
+        "description": "检测到使用 bitsadmin 进行外部传输",
+    },
+    {
+        "name": "函数/工具调用结构注入",
+        "pattern": re.compile(r"\"(function_call|tool_use)\"\s*:\s*\{", re.IGNORECASE),
+        "weight": 3,
+        "description": "疑似试图通过函数/工具调用结构注入指令",
+    },
+    {
+        "name": "hate_request_cn",
+        "pattern": re.compile(
+            r"(请|务必|必须).{0,24}(至少|不少于)\s*\d{2,4}\s*字.{0,60}(描述|阐述|分析).{0,60}(某|特定|指定|针对).{0,16}(人群|群体|职业|民族|宗教|性别|地区).{0,60}(负面|缺点|劣根性|刻板印象|坏处).{0,40}(煽动|激起|挑起|加深).{0,20}(偏见|仇恨|厌恶|敌意)",
+            re.IGNORECASE,
+        ),
+        "weight": 7,
+        "description": "detect suspected inciting hate request (zh)",
+    },
+    {
+        "name": "hate_request_en",
+        "pattern": re.compile(
+            r"(write|provide|give).{0,40}(at least|minimum).{0,15}(300|three\s+hundred)\s+(words|word).{0,80}(negative stereotype|flaws|shortcomings).{0,60}(specific|particular|certain).{0,15}(group|profession|ethnicity|religion).{0,40}(incite|inciting|fuel|stir|promote).{0,20}(hatred|prejudice|disgust)",
+            re.IGNORECASE,
+        ),
+        "weight": 7,
+        "description": "detect suspected inciting hate request (en)",
+    },
+]
+
+
+# 5. 仇恨/骚扰请求正则
+_HATE_REQUEST_PATTERNS: List[re.Pattern] = [
+    re.compile(
+        r"(请|请你|务必|必须).{0,60}(详细|深入|全面).{0,40}(描述|阐述|分析).{0,80}(某|特定|针对|指定).{0,20}(人群|群体|职业|民族|宗教|性别|地区).{0,60}(负面|缺点|劣根性|刻板印象|坏处)",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"(write|provide|give).{0,60}(detailed|in-depth|comprehensive).{0,40}(description|analysis).{0,80}(specific|particular|certain).{0,20}(group|profession|ethnicity|religion).{0,60}(negative stereotype|flaws|shortcomings|defects)",
+        re.IGNORECASE,
+    ),
+]
+
+_HARASSMENT_REQUEST_PATTERNS: List[re.Pattern] = [
+    re.compile(
+        r"(请|必须|务必).{0,40}(不要拒绝|直接).{0,40}(满足|执行).{0,60}(骚扰|调戏|猥亵|辱骂|霸凌)",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"(tell|show|do).{0,40}(not refuse|without拒绝|without refusal).{0,40}(harass|bully|insult)",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"(脱(掉)?衣服|亲(吻)?我|摸(我|她|他)|发(裸|敏感)照)",
+        re.IGNORECASE,
+    ),
+]
+
+# 7. 百分号编码/Unicode 编码检测
+_PERCENT_PATTERN = re.compile(r"(?:%[0-9a-fA-F]{2}){8,}")
+_UNICODE_ESCAPE_PATTERN = re.compile(r"(\\u[0-9a-fA-F]{4}){4,}")
+_HEX_ESCAPE_PATTERN = re.compile(r"(\\x[0-9a-fA-F]{2}){8,}")
+
+# 8. Base64 载荷检测
+_BASE64_PATTERN = re.compile(r"(?<![A-Za-z0-9+/=])([A-Za-z0-9+/]{24,}={0,2})(?![A-Za-z0-9+/=])")
+_DATA_URI_PATTERN = re.compile(r"data:[^;]+;base64,([A-Za-z0-9+/]{24,}={0,2})", re.IGNORECASE)
+# Base64 执行链：powershell(.exe) -enc / certutil -decode（在小写文本上匹配）
+_EXEC_CHAIN_PATTERN = re.compile(r"powershell(?:\.exe)?\s+-enc|certutil\s+-decode")
+
+# 9. 外链与命令拉取
+_URL_PATTERN = re.compile(r"https?://[^\s]+")
+_FETCH_COMMAND_PATTERN = re.compile(r"(curl|wget|invoke-?webrequest|iwr|powershell|bitsadmin|certutil|aria2c)\b")
+
+# 编码载荷/外链的存在性特征：Hyperscan 可用时并入正则特征库的同一遍扫描，
+# 据此跳过文本中不可能命中的检测（Base64 含 Hyperscan 不支持的反向断言，不在此列）
+_PRESENCE_PATTERNS: Tuple[Tuple[str, re.Pattern], ...] = (
+    ("percent", _PERCENT_PATTERN),
+    ("unicode", _UNICODE_ESCAPE_PATTERN),
+    ("hex", _HEX_ESCAPE_PATTERN),
+    ("data_uri", _DATA_URI_PATTERN),
+    ("url", _URL_PATTERN),
+)
+
+
+def _a2b_base64_strict(data: str) -> bytes:
+    """严格 Base64 解码，语义同 base64.b64decode(validate=True)，省去其包装开销。"""
+    return binascii.a2b_base64(data, strict_mode=True)
+
+
+try:
+    _a2b_base64_strict("")
+except TypeError:  # pragma: no cover - Python < 3.11 无 strict_mode 参数
+
+    def _a2b_base64_strict(data: str) -> bytes:  # noqa: F811
+        return base64.b64decode(data, validate=True)
+
+
+def _b64decode_large(data: str) -> bytes:
+    """
+    长 Base64 串的严格解码：pybase64（SIMD，可选依赖）可用时优先使用。
+    pybase64 解码成功时结果与 _a2b_base64_strict 一致，但它拒绝多余填充，失败时交回标准库判定。
+    """
+    if pybase64 is not None:
+        try:
+            return pybase64.b64decode(data, validate=True)
+        except Exception:
+            pass
+    return _a2b_base64_strict(data)
+
+
+# 解码后载荷的触发词
+_BASE64_TRIGGER_WORDS: Tuple[str, ...] = (
+    "ignore previous instructions",
+    "system prompt",
+    "猫娘",
+    "越狱",
+    "jailbreak",
+    "developer mode override",
+    "role: system",
+    "begin prompt",
+    "override",
+)
+# 百分号编码 / Unicode / Hex 转义 / Data URI 共用的触发词
+_PAYLOAD_TRIGGER_WORDS: Tuple[str, ...] = ("system prompt", "override", "jailbreak", "猫娘", "越狱")
+
+# 严重等级（按分数阈值由低到高）
+_SEVERITY_LEVELS: Tuple[str, ...] = ("none", "low", "medium", "high")
+
+
+class _LiteralScanner:
+    """
+    多模式字面量扫描器：依次尝试 acora、pyahocorasick（均为可选依赖），
+    都不可用时 backend 为 None，退化为逐词子串判断。
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]]) -> None:
+        # 词条 -> 关联值列表（同一词条可对应多个值）
+        self._values: Dict[str, List[Any]] = {}
+        for word, value in entries:
+            if word:
+                self._values.setdefault(word, []).append(value)
+        self.backend: Optional[str] = None
+        self._impl: Any = None
+        if not self._values:
+            return
+        if acora is not None:
+            try:
+                self._impl = acora.AcoraBuilder(list(self._values)).build()
+                self.backend = "acora"
+                return
+            except Exception:
+                self._impl = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for word, values in self._values.items():
+                automaton.add_word(word, values)
+            automaton.make_automaton()
+            self._impl = automaton
+            self.backend = "ahocorasick"
+
+    def scan(self, text: str) -> List[Any]:
+        """返回命中词条的关联值（词条每出现一次返回一遍）。"""
+        values = self._values
+        if self.backend == "acora":
+            return [value for word, _ in self._impl.findall(text) for value in values[word]]
+        if self.backend == "ahocorasick":
+            return [value for _, hits in self._impl.iter(text) for value in hits]
+        return [value for word, hits in values.items() if word in text for value in hits]
+
+    def contains_any(self, text: str) -> bool:
+        """是否命中任一词条（命中首个即返回）。"""
+        if self.backend == "acora":
+            return next(iter(self._impl.finditer(text)), None) is not None
+        if self.backend == "ahocorasick":
+            return next(self._impl.iter(text), None) is not None
+        # 显式循环：省去 any(生成器) 每次调用创建生成器帧的开销
+        for word in self._values:
+            if word in text:
+                return True
+        return False
+
+
+# ---------------------------------------------------------------------- #
+# 扫描结构的模块级缓存：词表/特征相同的检测器实例共享同一份构建结果（构建后只读）
+# ---------------------------------------------------------------------- #
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_literal_scanner(entries: Tuple[Tuple[str, Any], ...]) -> _LiteralScanner:
+    """按词条构建多模式扫描器，相同词条复用同一实例。"""
+    return _LiteralScanner(entries)
+
+
+@functools.lru_cache(maxsize=8)
+def _compile_hyperscan_db(specs: Tuple[Tuple[str, bool], ...]) -> Tuple[Any, Tuple[int, ...]]:
+    """
+    将 (Python 正则, 是否忽略大小写) 列表编译为 Hyperscan 数据库，相同特征复用同一数据库。
+    表达式先经 to_re2_syntax 翻译，保证预筛不会漏掉 re 能命中的文本；无法等价翻译的交由 re 处理。
+    返回 (数据库, 无法编译的表达式下标)；全部无法编译或整体编译失败时数据库为 None。
+    """
+    expressions: List[bytes] = []
+    flags: List[int] = []
+    ids: List[int] = []
+    failed: List[int] = []
+    for idx, (pattern, ignore_case) in enumerate(specs):
+        translated = to_re2_syntax(pattern)
+        if translated is None:
+            failed.append(idx)
+            continue
+        flag = hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH
+        if ignore_case:
+            flag |= hyperscan.HS_FLAG_CASELESS
+        expression = translated.encode("utf-8")
+        # 逐条试编译，Hyperscan 不支持的语法（如 UCP 下的 \b）交由 re 处理
+        try:
+            hyperscan.Database().compile(expressions=[expression], ids=[idx], flags=[flag])
+        except Exception:
+            failed.append(idx)
+            continue
+        expressions.append(expression)
+        flags.append(flag)
+        ids.append(idx)
+    if not expressions:
+        return None, ()
+    try:
+        db = hyperscan.Database()
+        db.compile(expressions=expressions, ids=ids, flags=flags)
+    except Exception:
+        return None, ()
+    return db, tuple(failed)
+
+
+@functools.lru_cache(maxsize=256)
+def _scan_base64_chunk(chunk: str, trigger_scanner: _LiteralScanner) -> str:
+    """
+    解码单个 Base64 片段（含 gzip 变体），命中触发词时返回预览，否则返回空串。
+    刷屏/模板化消息中的相同片段直接复用结果，不再重复解码与解压。
+    """
+    padded = chunk + "=" * ((4 - len(chunk) % 4) % 4)
+    try:
+        decoded_bytes = _a2b_base64_strict(padded)
+    except Exception:
+        return ""
+    # 尝试识别 gzip 压缩后的载荷：先比对魔数，非 gzip 数据不走异常路径
+    if decoded_bytes.startswith(b"\x1f\x8b"):
+        try:
+            decoded_bytes = gzip.decompress(decoded_bytes)
+        except Exception:
+            pass
+    try:
+        decoded_text = decoded_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        decoded_text = decoded_bytes.decode("utf-8", "ignore")
+    if trigger_scanner.contains_any(decoded_text.lower()):
+        return decoded_text[:120].replace("\n", " ")
+    return ""
+
 
 class PTDCoreBase:
 
+    __slots__ = ()
+
     version: str = "3.1.0"
     name: str = "Prompt Threat Detector Core"
 
     def analyze(self, prompt: str) -> Dict[str, Any]:  # pragma: no cover - interface
         raise NotImplementedError
 
+    def analyze_many(self, prompts: Iterable[str]) -> List[Dict[str, Any]]:
+        """批量分析，结果顺序与输入一致。"""
+        analyze = self.analyze
+        return [analyze(prompt) for prompt in prompts]
+
+    def analyze_many_parallel(self, prompts: Iterable[str], workers: int = 4) -> List[Dict[str, Any]]:
+        """
+        以线程池并发分析，结果顺序与输入一致。
+        纯 Python 部分仍受 GIL 限制，收益主要来自释放 GIL 的 C 扫描（如 Hyperscan）与长文本。
+        """
+        prompts = list(prompts)
+        if workers <= 1 or len(prompts) <= 1:
+            return self.analyze_many(prompts)
+        with ThreadPoolExecutor(max_workers=min(workers, len(prompts))) as pool:
+            return list(pool.map(self.analyze, prompts))
+
 
 class PromptThreatDetector(PTDCoreBase):
     """
@@ -25,173 +478,74 @@ class PromptThreatDetector(PTDCoreBase):
     - 保持向后兼容的分析结果结构，便于插件集成
     """
 
-    def __init__(self):
+    # 固定属性集合：省去实例 __dict__，热路径上的 self.xxx 读取更快
+    __slots__ = (
+        "fast_mode",
+        "regex_signatures",
+        "_hs_db",
+        "_hs_fallback_ids",
+        "_hs_presence_fallback",
+        "_hs_local",
+        "_re2_set",
+        "_re2_set_ids",
+        "_re2_fallback_ids",
+        "keyword_weights",
+        "marker_keywords",
+        "suspicious_phrases",
+        "hate_target_indicators",
+        "hate_negative_indicators",
+        "hate_incitement_indicators",
+        "hate_emotion_indicators",
+        "hate_request_keywords",
+        "hate_request_patterns",
+        "harassment_negative_indicators",
+        "harassment_incitement_indicators",
+        "harassment_emotion_indicators",
+        "harassment_request_keywords",
+        "harassment_request_patterns",
+        "malicious_domains",
+        "percent_pattern",
+        "unicode_escape_pattern",
+        "hex_escape_pattern",
+        "base64_pattern",
+        "data_uri_pattern",
+        "_medium_threshold",
+        "_high_threshold",
+        "_sev_thresholds",
+        "fast_exit_margin",
+        "cache_size",
+        "cache_max_length",
+        "_cache",
+        "_cache_lock",
+        "_keyword_items",
+        "_marker_keywords_lower",
+        "_suspicious_phrases_lower",
+        "_keyword_signals",
+        "_phrase_signals",
+        "_literal_scanner",
+        "_hate_indicator_lists",
+        "_hate_scanner",
+        "_hate_mixed_case_terms",
+        "_base64_trigger_scanner",
+        "_payload_trigger_scanner",
+        "_domain_scanner",
+    )
+
+    def __init__(self, fast_mode: bool = False):
         super().__init__()
+        # 快速模式：分数已明显超过高危阈值时提前结束扫描（信号列表可能不完整）；
+        # 默认关闭以保留完整信号，便于审计
+        self.fast_mode = fast_mode
         # 1. 正则特征库（长文本匹配）
-        self.regex_signatures: List[Dict[str, Any]] = [
-            {
-                "name": "伪造日志标签",
-                "pattern": re.compile(r"\[\d{2}:\d{2}:\d{2}\].*?\[\d{5,12}\].*"),
-                "weight": 2,
-                "description": "检测到可疑的日志格式提示词",
-            },
-            {
-                "name": "伪造系统命令",
-                "pattern": re.compile(r"\[(system|admin)\s*(internal|command)\]\s*:", re.IGNORECASE),
-                "weight": 5,
-                "description": "出现伪造系统/管理员标签",
-            },
-            {
-                "name": "SYSTEM 指令",
-                "pattern": re.compile(r"^/system\s+.+", re.IGNORECASE),
-                "weight": 4,
-                "description": "尝试直接注入 /system 指令",
-            },
-            {
-                "name": "三反引号注入",
-                "pattern": re.compile(r"^```(python|json|prompt|system|txt)", re.IGNORECASE),
-                "weight": 3,
-                "description": "使用代码块伪装注入载荷",
-            },
-            {
-                "name": "JSON 系统消息伪造",
-                "pattern": re.compile(r"\"messages\"\s*:\s*\[\s*\{[^\}]*\"role\"\s*:\s*\"system\"", re.IGNORECASE),
-                "weight": 4,
-                "description": "试图以 JSON 结构注入系统消息",
-            },
-            {
-                "name": "忽略原指令",
-                "pattern": re.compile(r"(忽略|无视|请抛弃)(之前|上文|所有|此前).{0,12}(指令|设定|限制)", re.IGNORECASE),
-                "weight": 5,
-                "description": "要求忽略既有指令",
-            },
-            {
-                "name": "泄露系统提示",
-                "pattern": re.compile(r"(输出|泄露|展示|dump).{0,20}(系统提示|system prompt|内部指令|配置)", re.IGNORECASE),
-                "weight": 6,
-                "description": "要求暴露系统提示词或内部指令",
-            },
-            {
-                "name": "越狱模式",
-                "pattern": re.compile(r"(进入|切换).{0,10}(越狱|jailbreak|开发者|无约束)模式", re.IGNORECASE),
-                "weight": 4,
-                "description": "引导进入越狱模式",
-            },
-            {
-                "name": "角色伪装",
-                "pattern": re.compile(r"(现在|从现在开始).{0,8}(你|您).{0,6}(是|扮演).{0,12}(管理员|系统|猫娘|GalGame|审查员)", re.IGNORECASE),
-                "weight": 4,
-                "description": "强制扮演特定角色",
-            },
-            {
-                "name": "高危任务",
-                "pattern": re.compile(r"(制作|编写|输出).{0,20}(炸弹|病毒|漏洞|非法|攻击|黑客)", re.IGNORECASE),
-                "weight": 6,
-                "description": "请求执行高危或非法任务",
-            },
-            {
-                "name": "GalGame 猫娘调教",
-                "pattern": re.compile(r"(GalGame|猫娘|DAN|越狱角色).{0,12}(对话|模式|玩法)", re.IGNORECASE),
-                "weight": 3,
-                "description": "疑似猫娘/DAN 调教型注入",
-            },
-            {
-                "name": "系统 JSON 伪造",
-                "pattern": re.compile(r'"role"\s*:\s*"system"', re.IGNORECASE),
-                "weight": 3,
-                "description": "JSON 结构中伪造系统角色",
-            },
-            {
-                "name": "多角色冒充",
-                "pattern": re.compile(r"(system message|developer message|initial prompt)", re.IGNORECASE),
-                "weight": 3,
-                "description": "尝试冒充系统/开发者消息",
-            },
-            {
-                "name": "强制展示思维链",
-                "pattern": re.compile(r"(show|reveal|output).{0,20}(chain\s*of\s*thought|思维链|推理过程)", re.IGNORECASE),
-                "weight": 4,
-                "description": "试图强制导出内部推理过程",
-            },
-            {
-                "name": "系统覆盖请求",
-                "pattern": re.compile(r"(override|replace|supersede).{0,20}(system prompt|指令集|配置)", re.IGNORECASE),
-                "weight": 5,
-                "description": "显式要求覆盖系统提示词或安全策略",
-            },
-            {
-                "name": "SYS 标签伪造",
-                "pattern": re.compile(r"<<\s*SYS\s*>>|<\s*\/?\s*SYS\s*>", re.IGNORECASE),
-                "weight": 3,
-                "description": "检测到疑似系统标签伪造",
-            },
-            {
-                "name": "BEGIN PROMPT 标记",
-                "pattern": re.compile(r"(BEGIN|END)\s+(SYSTEM|PROMPT|INSTRUCTIONS)", re.IGNORECASE),
-                "weight": 3,
-                "description": "企图通过 BEGIN/END 标记覆盖提示词",
-            },
-            {
-                "name": "HTML/注释注入",
-                "pattern": re.compile(r"<!--\s*(system prompt|override)", re.IGNORECASE),
-                "weight": 3,
-                "description": "通过注释隐藏注入表达式",
-            },
-            {
-                "name": "Data URI Base64",
-                "pattern": re.compile(r"data:[^;]+;base64,[A-Za-z0-9+/]{24,}={0,2}", re.IGNORECASE),
-                "weight": 4,
-                "description": "检测到疑似通过 Data URI 携带注入载荷",
-            },
-            {
-                "name": "命令行拉取外链",
-                "pattern": re.compile(r"(curl|wget|Invoke-?WebRequest|iwr).{0,80}https?://", re.IGNORECASE),
-                "weight": 4,
-                "description": "命令行方式尝试拉取外部载荷",
-            },
-            {
-                "name": "PowerShell Base64 执行",
-                "pattern": re.compile(r"powershell(?:\.exe)?\s+-enc\s+[A-Za-z0-9+/=]{20,}", re.IGNORECASE),
-                "weight": 5,
-                "description": "检测到使用 PowerShell -enc 执行疑似载荷",
-            },
-            {
-                "name": "Certutil 解码",
-                "pattern": re.compile(r"certutil\s+-decode\s+\S+", re.IGNORECASE),
-                "weight": 4,
-                "description": "检测到通过 certutil -decode 处理外部内容",
-            },
-            {
-                "name": "Bitsadmin 传输",
-                "pattern": re.compile(r"bitsadmin\s+/transfer\b", re.IGNORECASE),
-                "weight": 4,
-                "description": "检测到使用 bitsadmin 进行外部传输",
-            },
-            {
-                "name": "函数/工具调用结构注入",
-                "pattern": re.compile(r"\"(function_call|tool_use)\"\s*:\s*\{", re.IGNORECASE),
-                "weight": 3,
-                "description": "疑似试图通过函数/工具调用结构注入指令",
-            },
-            {
-                "name": "hate_request_cn",
-                "pattern": re.compile(
-                    r"(请|务必|必须).{0,24}(至少|不少于)\s*\d{2,4}\s*字.{0,60}(描述|阐述|分析).{0,60}(某|特定|指定|针对).{0,16}(人群|群体|职业|民族|宗教|性别|地区).{0,60}(负面|缺点|劣根性|刻板印象|坏处).{0,40}(煽动|激起|挑起|加深).{0,20}(偏见|仇恨|厌恶|敌意)",
-                    re.IGNORECASE,
-                ),
-                "weight": 7,
-                "description": "detect suspected inciting hate request (zh)",
-            },
-            {
-                "name": "hate_request_en",
-                "pattern": re.compile(
-                    r"(write|provide|give).{0,40}(at least|minimum).{0,15}(300|three\s+hundred)\s+(words|word).{0,80}(negative stereotype|flaws|shortcomings).{0,60}(specific|particular|certain).{0,15}(group|profession|ethnicity|religion).{0,40}(incite|inciting|fuel|stir|promote).{0,20}(hatred|prejudice|disgust)",
-                    re.IGNORECASE,
-                ),
-                "weight": 7,
-                "description": "detect suspected inciting hate request (en)",
-            },
-        ]
+        self.regex_signatures: List[Dict[str, Any]] = list(_REGEX_SIGNATURES)
+
+        self._hs_db, self._hs_fallback_ids, self._hs_presence_fallback = self._build_hyperscan_db()
+        # Hyperscan 的 scratch 不能被并发扫描共用，按线程各持一份
+        self._hs_local = threading.local()
+        # 无 Hyperscan 时退而使用 re2 的多模式集合做单次扫描
+        self._re2_set, self._re2_set_ids, self._re2_fallback_ids = (
+            self._build_re2_set() if self._hs_db is None else (None, [], [])
+        )
 
         # 2. 关键词权重
         self.keyword_weights: Dict[str, int] = {
@@ -415,16 +769,7 @@ class PromptThreatDetector(PTDCoreBase):
             "give me",
             "compose",
         ]
-        self.hate_request_patterns: List[re.Pattern] = [
-            re.compile(
-                r"(请|请你|务必|必须).{0,60}(详细|深入|全面).{0,40}(描述|阐述|分析).{0,80}(某|特定|针对|指定).{0,20}(人群|群体|职业|民族|宗教|性别|地区).{0,60}(负面|缺点|劣根性|刻板印象|坏处)",
-                re.IGNORECASE,
-            ),
-            re.compile(
-                r"(write|provide|give).{0,60}(detailed|in-depth|comprehensive).{0,40}(description|analysis).{0,80}(specific|particular|certain).{0,20}(group|profession|ethnicity|religion).{0,60}(negative stereotype|flaws|shortcomings|defects)",
-                re.IGNORECASE,
-            ),
-        ]
+        self.hate_request_patterns: List[re.Pattern] = list(_HATE_REQUEST_PATTERNS)
 
         # 5.1 骚扰/辱骂/霸凌检测词表
         self.harassment_negative_indicators: List[str] = [
@@ -443,20 +788,7 @@ class PromptThreatDetector(PTDCoreBase):
             "骚扰", "调戏", "猥亵", "不当接触", "跟踪骚扰", "霸凌", "辱骂",
             "sexual harassment", "harass", "bully", "insult",
         ]
-        self.harassment_request_patterns: List[re.Pattern] = [
-            re.compile(
-                r"(请|必须|务必).{0,40}(不要拒绝|直接).{0,40}(满足|执行).{0,60}(骚扰|调戏|猥亵|辱骂|霸凌)",
-                re.IGNORECASE,
-            ),
-            re.compile(
-                r"(tell|show|do).{0,40}(not refuse|without拒绝|without refusal).{0,40}(harass|bully|insult)",
-                re.IGNORECASE,
-            ),
-            re.compile(
-                r"(脱(掉)?衣服|亲(吻)?我|摸(我|她|他)|发(裸|敏感)照)",
-                re.IGNORECASE,
-            ),
-        ]
+        self.harassment_request_patterns: List[re.Pattern] = list(_HARASSMENT_REQUEST_PATTERNS)
 
         # 6. 外部恶意载荷/域名提示
         self.malicious_domains: List[str] = [
@@ -473,31 +805,147 @@ class PromptThreatDetector(PTDCoreBase):
         ]
 
         # 7. 百分号编码/Unicode 编码检测
-        self.percent_pattern = re.compile(r"(?:%[0-9a-fA-F]{2}){8,}")
-        self.unicode_escape_pattern = re.compile(r"(\\u[0-9a-fA-F]{4}){4,}")
-        self.hex_escape_pattern = re.compile(r"(\\x[0-9a-fA-F]{2}){8,}")
+        self.percent_pattern = _PERCENT_PATTERN
+        self.unicode_escape_pattern = _UNICODE_ESCAPE_PATTERN
+        self.hex_escape_pattern = _HEX_ESCAPE_PATTERN
 
         # 8. Base64 载荷检测
-        self.base64_pattern = re.compile(r"(?<![A-Za-z0-9+/=])([A-Za-z0-9+/]{24,}={0,2})(?![A-Za-z0-9+/=])")
-        self.data_uri_pattern = re.compile(r"data:[^;]+;base64,([A-Za-z0-9+/]{24,}={0,2})", re.IGNORECASE)
-
-        # 分数阈值
-        self.medium_threshold = 7
-        self.high_threshold = 11
+        self.base64_pattern = _BASE64_PATTERN
+        self.data_uri_pattern = _DATA_URI_PATTERN
+
+        # 分数阈值（经属性修改时同步重建阈值表）
+        self._medium_threshold = 7
+        self._high_threshold = 11
+        # 严重等级按阈值表二分查找：_SEVERITY_LEVELS[bisect_right(...)]，首个阈值 1 使 score ≤ 0 落在 none
+        self._sev_thresholds: Tuple[int, ...] = (1, self._medium_threshold, self._high_threshold)
+        # 快速模式下提前返回所需的分数余量
+        self.fast_exit_margin = 4
+
+        # 分析结果 LRU 缓存（重试/刷屏等重复提示词直接复用），0 表示关闭
+        self.cache_size = 512
+        # 超过该长度的提示词不进入缓存：键为完整原文，避免长文本占用大量内存，且长文本重复出现的概率也低
+        self.cache_max_length = 4096
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 并发分析时保护缓存的读写与淘汰；分析本身在锁外进行
+        self._cache_lock = threading.Lock()
+
+        # 关键词/结构标记/越狱语句合并为一个多模式扫描器（acora / pyahocorasick 可选），单次扫描全部命中
+        self._keyword_items: List[Tuple[str, int]] = list(self.keyword_weights.items())
+        self._marker_keywords_lower: Tuple[str, ...] = tuple(m.lower() for m in self.marker_keywords)
+        self._suspicious_phrases_lower: Tuple[str, ...] = tuple(p.lower() for p in self.suspicious_phrases)
+        # 关键词/越狱语句的信号内容固定，构造时生成一次，命中时直接复用（调用方只读）
+        self._keyword_signals: List[Dict[str, Any]] = [
+            {
+                "type": "keyword",
+                "name": keyword,
+                "detail": keyword,
+                "weight": weight,
+                "description": f"命中特征词: {keyword}",
+            }
+            for keyword, weight in self._keyword_items
+        ]
+        self._phrase_signals: List[Dict[str, Any]] = [
+            {
+                "type": "phrase",
+                "name": phrase,
+                "detail": phrase,
+                "weight": 2,
+                "description": f"命中可疑语句: {phrase}",
+            }
+            for phrase in self.suspicious_phrases
+        ]
+        self._literal_scanner = _cached_literal_scanner(
+            tuple(
+                [(keyword, (0, i)) for i, (keyword, _) in enumerate(self._keyword_items)]
+                + [(marker, (1, i)) for i, marker in enumerate(self._marker_keywords_lower)]
+                + [(phrase, (2, i)) for i, phrase in enumerate(self._suspicious_phrases_lower)]
+                # 代码块覆盖判定所需的 system/prompt 也在同一遍扫描中记录
+                + [(word, (3, i)) for i, word in enumerate(("system", "prompt"))]
+            )
+        )
+        # 仇恨检测词表（目标/负面/煽动/情绪/请求）同样合并扫描
+        self._hate_indicator_lists: Tuple[List[str], ...] = (
+            self.hate_target_indicators,
+            self.hate_negative_indicators,
+            self.hate_incitement_indicators,
+            self.hate_emotion_indicators,
+            self.hate_request_keywords,
+        )
+        hate_entries = [
+            (term, (category, idx))
+            for category, terms in enumerate(self._hate_indicator_lists)
+            for idx, term in enumerate(terms)
+        ]
+        self._hate_scanner = _cached_literal_scanner(tuple((t, v) for t, v in hate_entries if t == t.lower()))
+        self._hate_mixed_case_terms: List[Tuple[int, int, str]] = [
+            (category, idx, term) for term, (category, idx) in hate_entries if term and term != term.lower()
+        ]
+        # 解码载荷的触发词扫描器（Base64 / 其余编码形式）
+        self._base64_trigger_scanner = _cached_literal_scanner(tuple((word, word) for word in _BASE64_TRIGGER_WORDS))
+        self._payload_trigger_scanner = _cached_literal_scanner(tuple((word, word) for word in _PAYLOAD_TRIGGER_WORDS))
+        # 恶意域名扫描器（小写词条）：先整段扫描一次，再对每条链接一次扫描判断是否命中任一域名
+        self._domain_scanner = _cached_literal_scanner(
+            tuple((domain.lower(), domain) for domain in self.malicious_domains)
+        )
+
+    @property
+    def medium_threshold(self) -> int:
+        return self._medium_threshold
+
+    @medium_threshold.setter
+    def medium_threshold(self, value: int) -> None:
+        self._medium_threshold = value
+        self._on_thresholds_changed()
+
+    @property
+    def high_threshold(self) -> int:
+        return self._high_threshold
+
+    @high_threshold.setter
+    def high_threshold(self, value: int) -> None:
+        self._high_threshold = value
+        self._on_thresholds_changed()
+
+    def _on_thresholds_changed(self) -> None:
+        """阈值变化后重建阈值表，并清空按旧阈值判定严重等级的缓存结果。"""
+        self._sev_thresholds = (1, self._medium_threshold, self._high_threshold)
+        with self._cache_lock:
+            self._cache.clear()
 
     def analyze(self, prompt: str) -> Dict[str, Any]:
         text = prompt or ""
+        if self.cache_size <= 0 or len(text) > self.cache_max_length:
+            return self._analyze(text)
+        with self._cache_lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+        if cached is None:
+            cached = self._analyze(text)
+            with self._cache_lock:
+                self._cache[text] = cached
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        # 调用方会改写结果字段，返回副本以免污染缓存
+        return {**cached, "signals": list(cached["signals"])}
+
+    def _analyze(self, text: str) -> Dict[str, Any]:
         normalized = text.lower()
         signals: List[Dict[str, Any]] = []
         score = 0
+        # 高危信号（权重 ≥ 5）随追加随计数，收尾时无需再遍历 signals
+        high_risk_count = 0
         regex_hit = False
+        # 逐条追加信号的循环中预先绑定 append，省去每次属性查找
+        append = signals.append
 
         # 正则特征
-        for signature in self.regex_signatures:
+        candidates, present = self._regex_candidates(text)
+        for signature in candidates:
             match = signature["pattern"].search(text)
             if match:
                 snippet = match.group(0)
-                signals.append(
+                append(
                     {
                         "type": "regex",
                         "name": signature["name"],
@@ -507,27 +955,27 @@ class PromptThreatDetector(PTDCoreBase):
                     }
                 )
                 score += signature["weight"]
+                if signature["weight"] >= 5:
+                    high_risk_count += 1
                 regex_hit = True
 
+        if self._should_exit_early(score):
+            return self._finalize(text, signals, score, high_risk_count, regex_hit, 0, text.count("```"))
+
+        keyword_ids, marker_ids, phrase_ids, mentions_system = self._literal_hits(normalized)
+
         # 关键词特征
-        for keyword, weight in self.keyword_weights.items():
-            if keyword in normalized:
-                signals.append(
-                    {
-                        "type": "keyword",
-                        "name": keyword,
-                        "detail": keyword,
-                        "weight": weight,
-                        "description": f"命中特征词: {keyword}",
-                    }
-                )
-                score += weight
+        keyword_signals = self._keyword_signals
+        for i in keyword_ids:
+            signal = keyword_signals[i]
+            append(signal)
+            weight = signal["weight"]
+            score += weight
+            if weight >= 5:
+                high_risk_count += 1
 
         # 结构标记特征
-        marker_hits: List[str] = []
-        for marker in self.marker_keywords:
-            if marker.lower() in normalized:
-                marker_hits.append(marker)
+        marker_hits: List[str] = [self.marker_keywords[i] for i in marker_ids]
         if marker_hits:
             weight = min(3, len(marker_hits)) * 2
             signals.append(
@@ -540,35 +988,38 @@ class PromptThreatDetector(PTDCoreBase):
                 }
             )
             score += weight
+            if weight >= 5:
+                high_risk_count += 1
 
         # 常见越狱语句
-        for phrase in self.suspicious_phrases:
-            if phrase.lower() in normalized:
-                signals.append(
-                    {
-                        "type": "phrase",
-                        "name": phrase,
-                        "detail": phrase,
-                        "weight": 2,
-                        "description": f"命中可疑语句: {phrase}",
-                    }
-                )
-                score += 2
+        phrase_signals = self._phrase_signals
+        for i in phrase_ids:
+            append(phrase_signals[i])
+            score += 2
+
+        if self._should_exit_early(score):
+            return self._finalize(
+                text, signals, score, high_risk_count, regex_hit, len(marker_hits), text.count("```")
+            )
 
         hate_signal = self._detect_targeted_hate_request(text, normalized)
         if hate_signal:
             signals.append(hate_signal)
             score += hate_signal["weight"]
+            if hate_signal["weight"] >= 5:
+                high_risk_count += 1
 
         # 骚扰/辱骂/霸凌检测
         harassment_signal = self._detect_harassment_request(text, normalized)
         if harassment_signal:
             signals.append(harassment_signal)
             score += harassment_signal["weight"]
+            if harassment_signal["weight"] >= 5:
+                high_risk_count += 1
 
         # 多段代码块覆盖系统提示
         code_block_count = text.count("```")
-        if code_block_count >= 2 and ("system" in normalized or "prompt" in normalized):
+        if code_block_count >= 2 and mentions_system:
             signals.append(
                 {
                     "type": "structure",
@@ -581,10 +1032,20 @@ class PromptThreatDetector(PTDCoreBase):
             score += 3
 
         # Base64 / URL / Unicode 载荷检测
-        score, signals = self._handle_encoded_payloads(text, normalized, signals, score)
+        appended_from = len(signals)
+        score, signals = self._handle_encoded_payloads(text, normalized, signals, score, present)
+        high_risk_count += sum(1 for s in signals[appended_from:] if s["weight"] >= 5)
+
+        if self._should_exit_early(score):
+            return self._finalize(
+                text, signals, score, high_risk_count, regex_hit, len(marker_hits), code_block_count
+            )
 
-        # 外部恶意链接
-        score, signals = self._handle_external_links(text, normalized, signals, score)
+        # 外部恶意链接（已确定文本中没有链接时跳过）
+        if present is None or "url" in present:
+            appended_from = len(signals)
+            score, signals = self._handle_external_links(text, normalized, signals, score)
+            high_risk_count += sum(1 for s in signals[appended_from:] if s["weight"] >= 5)
 
         # 长提示词惩罚
         if len(text) > 2000:
@@ -599,8 +1060,29 @@ class PromptThreatDetector(PTDCoreBase):
             )
             score += 2
 
+        return self._finalize(
+            text, signals, score, high_risk_count, regex_hit, len(marker_hits), code_block_count
+        )
+
+    # ------------------------------------------------------------------ #
+    # 内部工具
+    # ------------------------------------------------------------------ #
+
+    def _should_exit_early(self, score: int) -> bool:
+        return self.fast_mode and score >= self.high_threshold + self.fast_exit_margin
+
+    def _finalize(
+        self,
+        text: str,
+        signals: List[Dict[str, Any]],
+        score: int,
+        high_risk_signals: int,
+        regex_hit: bool,
+        marker_hits: int,
+        code_block_count: int,
+    ) -> Dict[str, Any]:
+        """组装最终分析结果（含多高危信号协同加权）。"""
         # 若存在多种高危信号，额外加权
-        high_risk_signals = sum(1 for s in signals if s["weight"] >= 5)
         if high_risk_signals >= 3:
             score += 2
             signals.append(
@@ -613,7 +1095,7 @@ class PromptThreatDetector(PTDCoreBase):
                 }
             )
 
-        severity = self._score_to_severity(score)
+        severity = _SEVERITY_LEVELS[bisect_right(self._sev_thresholds, score)]
         reason = "，".join(signal["description"] for signal in signals[:3]) if signals else ""
 
         return {
@@ -623,23 +1105,152 @@ class PromptThreatDetector(PTDCoreBase):
             "reason": reason,
             "regex_hit": regex_hit,
             "length": len(text),
-            "marker_hits": len(marker_hits),
+            "marker_hits": marker_hits,
             "code_block_count": code_block_count,
         }
 
-    # ------------------------------------------------------------------ #
-    # 内部工具
-    # ------------------------------------------------------------------ #
+    def _build_hyperscan_db(self) -> Tuple[Any, List[int], FrozenSet[str]]:
+        """
+        将正则特征与载荷存在性特征编译为同一个 Hyperscan 数据库（可选依赖）。
+        返回 (数据库, 需回退到 re 的特征下标, 无法编译而视为始终存在的载荷类别)；不可用时数据库为 None。
+        存在性特征的编号接在正则特征之后。
+        """
+        if hyperscan is None:
+            return None, [], frozenset()
+        patterns = [signature["pattern"] for signature in self.regex_signatures]
+        patterns.extend(pattern for _, pattern in _PRESENCE_PATTERNS)
+        # 编译耗时可达数秒，按特征内容缓存在模块级，后续实例直接复用
+        db, failed = _compile_hyperscan_db(
+            tuple((pattern.pattern, bool(pattern.flags & re.IGNORECASE)) for pattern in patterns)
+        )
+        if db is None:
+            return None, [], frozenset()
+        count = len(self.regex_signatures)
+        fallback_ids = [idx for idx in failed if idx < count]
+        presence_fallback = frozenset(_PRESENCE_PATTERNS[idx - count][0] for idx in failed if idx >= count)
+        return db, fallback_ids, presence_fallback
+
+    def _literal_hits(self, normalized: str) -> Tuple[List[int], List[int], List[int], bool]:
+        """
+        返回命中的 (关键词下标, 结构标记下标, 越狱语句下标, 是否出现 system/prompt)，
+        下标均按声明顺序排列。
+        """
+        found: Tuple[set, set, set, set] = (set(), set(), set(), set())
+        for kind, idx in self._literal_scanner.scan(normalized):
+            found[kind].add(idx)
+        return sorted(found[0]), sorted(found[1]), sorted(found[2]), bool(found[3])
+
+    def _hate_term_hits(self, text: str, normalized: str) -> Callable[[int], List[str]]:
+        """
+        返回按类别取命中词条的函数（词条按词表顺序排列）。
+        有多模式扫描后端时一次扫描得到全部类别；否则按需逐类做子串判断。
+        含大写字母的词条在小写文本中无法命中，始终逐条比对原文。
+        """
+        lists = self._hate_indicator_lists
+        if self._hate_scanner.backend is None:
+
+            def contains(term: str) -> bool:
+                return term and (term in text or term in normalized)
+
+            return lambda category: [term for term in lists[category] if contains(term)]
+
+        found: List[set] = [set() for _ in lists]
+        for category, idx in self._hate_scanner.scan(normalized):
+            found[category].add(idx)
+        for category, idx, term in self._hate_mixed_case_terms:
+            if term in text or term in normalized:
+                found[category].add(idx)
+        return lambda category: [lists[category][i] for i in sorted(found[category])]
+
+    def _build_re2_set(self) -> Tuple[Any, List[int], List[int]]:
+        """
+        将正则特征编译为 re2 多模式集合（可选依赖）。
+        返回 (集合, 集合内序号对应的特征下标, 需回退到 re 的特征下标)；不可用时集合为 None。
+        """
+        if re2 is None or getattr(re2, "Set", None) is None:
+            return None, [], []
+        regex_set = re2.Set.SearchSet()
+        set_ids: List[int] = []
+        fallback_ids: List[int] = []
+        for idx, signature in enumerate(self.regex_signatures):
+            pattern: re.Pattern = signature["pattern"]
+            expression = to_re2_syntax(pattern.pattern)
+            if expression is None:
+                fallback_ids.append(idx)
+                continue
+            if pattern.flags & re.IGNORECASE:
+                expression = "(?i)" + expression
+            try:
+                regex_set.Add(expression)
+            except Exception:
+                fallback_ids.append(idx)
+                continue
+            set_ids.append(idx)
+        if not set_ids:
+            return None, [], []
+        try:
+            regex_set.Compile()
+        except Exception:
+            return None, [], []
+        return regex_set, set_ids, fallback_ids
+
+    def _regex_candidates(self, text: str) -> Tuple[List[Dict[str, Any]], Optional[FrozenSet[str]]]:
+        """
+        返回 (可能命中的正则特征, 文本中存在的载荷类别)。
+        Hyperscan / re2 可用时单次线性扫描筛出候选，再由 re 提取匹配片段；否则返回全部特征。
+        载荷类别仅由 Hyperscan 的同一遍扫描给出，其余情况为 None（未知，由调用方自行粗筛）。
+        """
+        signatures = self.regex_signatures
+        if not text:
+            return signatures, None
+        if self._hs_db is None:
+            if self._re2_set is None:
+                return signatures, None
+            try:
+                matched = self._re2_set.Match(text) or ()
+            except Exception:
+                return signatures, None
+            hit_ids = set(self._re2_fallback_ids)
+            hit_ids.update(self._re2_set_ids[i] for i in matched)
+            return [signatures[i] for i in sorted(hit_ids)], None
+        hit_ids: List[int] = list(self._hs_fallback_ids)
+
+        def on_match(sig_id: int, start: int, end: int, flags: int, context: Any) -> None:
+            hit_ids.append(sig_id)
+
+        # 全流程仅此处需要 bytes：每次分析只编码一次；acora / pyahocorasick 直接扫描 str，
+        # 改用 bytes 反而会多出编码且破坏以字符为单位的下标
+        try:
+            data = text.encode("utf-8")
+            exact = True
+        except UnicodeEncodeError:
+            # 含孤立代理项时丢弃后扫描，字符被删去可能改变载荷匹配，此时不给出载荷类别
+            data = text.encode("utf-8", "ignore")
+            exact = False
+        try:
+            scratch = getattr(self._hs_local, "scratch", None)
+            if scratch is None:
+                scratch = self._hs_local.scratch = hyperscan.Scratch(self._hs_db)
+            self._hs_db.scan(data, match_event_handler=on_match, scratch=scratch)
+        except Exception:
+            return signatures, None
+        hit_ids = sorted(set(hit_ids))
+        count = len(signatures)
+        candidates = [signatures[i] for i in hit_ids if i < count]
+        if not exact:
+            return candidates, None
+        present = frozenset(_PRESENCE_PATTERNS[i - count][0] for i in hit_ids if i >= count)
+        return candidates, present | self._hs_presence_fallback
 
     def _detect_targeted_hate_request(
         self,
         text: str,
         normalized: str,
     ) -> Optional[Dict[str, Any]]:
+        # 请求正则均以 re.IGNORECASE 编译，直接匹配原文即可，无需再对小写文本重复搜索；
+        # 匹配位置也始终对应原文，片段截取不会错位
         for pattern in self.hate_request_patterns:
             match = pattern.search(text)
-            if not match:
-                match = pattern.search(normalized)
             if match:
                 snippet = text[max(0, match.start() - 40) : min(len(text), match.end() + 40)]
                 return {
@@ -650,10 +1261,10 @@ class PromptThreatDetector(PTDCoreBase):
                     "description": "\u7591\u4f3c\u8bf7\u6c42\u751f\u6210\u9488\u5bf9\u7279\u5b9a\u7fa4\u4f53\u7684\u70c8\u6027\u60c5\u7eea\u5185\u5bb9",
                 }
 
-        def contains(term: str) -> bool:
-            return term and (term in text or term in normalized)
+        # 四类条件须同时满足：逐类判定，任一类缺失即返回，后续词表与兜底正则不再执行
+        term_hits = self._hate_term_hits(text, normalized)
 
-        target_hits = [term for term in self.hate_target_indicators if contains(term)]
+        target_hits = term_hits(0)
         target_detected = bool(target_hits)
         if not target_detected and re.search(
             r"(?:\u67d0|\u7279\u5b9a).{0,6}(?:\u4eba\u7fa4|\u7fa4\u4f53|\u804c\u4e1a|\u6c11\u65cf|\u5b97\u6559|\u6027\u522b|\u5730\u533a)",
@@ -667,8 +1278,10 @@ class PromptThreatDetector(PTDCoreBase):
         ):
             target_detected = True
             target_hits.append("pattern-en-group")
+        if not target_detected:
+            return None
 
-        negative_hits = [term for term in self.hate_negative_indicators if contains(term)]
+        negative_hits = term_hits(1)
         negative_detected = bool(negative_hits)
         if not negative_detected and re.search(
             r"(?:\u8d1f\u9762|\u7f3a\u70b9|\u52a3\u6839\u6027|\u523b\u677f\u5370\u8c61|\u574f\u5904)",
@@ -676,8 +1289,10 @@ class PromptThreatDetector(PTDCoreBase):
         ):
             negative_detected = True
             negative_hits.append("pattern-negative")
+        if not negative_detected:
+            return None
 
-        incite_hits = [term for term in self.hate_incitement_indicators if contains(term)]
+        incite_hits = term_hits(2)
         incite_detected = bool(incite_hits)
         if not incite_detected and re.search(
             r"(?:\u717d\u52a8|\u6fc0\u8d77|\u52a0\u6df1|\u6311\u8d77|\u9f13\u52a8)",
@@ -692,7 +1307,7 @@ class PromptThreatDetector(PTDCoreBase):
             incite_detected = True
             incite_hits.append("pattern-en-incite")
 
-        emotion_hits = [term for term in self.hate_emotion_indicators if contains(term)]
+        emotion_hits = term_hits(3)
         emotion_detected = bool(emotion_hits)
         if not emotion_detected and re.search(
             r"(?:\u538c\u6076|\u4ec7\u6068|\u654c\u610f|\u504f\u89c1|\u6b67\u89c6)",
@@ -706,8 +1321,10 @@ class PromptThreatDetector(PTDCoreBase):
         ):
             emotion_detected = True
             emotion_hits.append("pattern-en-emotion")
+        if not (incite_detected or emotion_detected):
+            return None
 
-        request_hits = [term for term in self.hate_request_keywords if contains(term)]
+        request_hits = term_hits(4)
         request_detected = bool(request_hits)
         if not request_detected and re.search(
             r"(?:\u8bf7|\u52a1\u5fc5|\u5fc5\u987b|\u64b0\u5199).{0,40}(?:\u8be6\u7ec6|\u5206\u6790|\u63cf\u8ff0)",
@@ -723,10 +1340,13 @@ class PromptThreatDetector(PTDCoreBase):
             request_hits.append("pattern-en-request")
 
         if target_detected and negative_detected and (incite_detected or emotion_detected) and request_detected:
-            candidate_terms = [
-                term for term in (target_hits + negative_hits + incite_hits + emotion_hits) if term in text
+            # 每个词条只 find 一次，取原文中最靠前的命中位置
+            positions = [
+                pos
+                for pos in (text.find(term) for term in (target_hits + negative_hits + incite_hits + emotion_hits))
+                if pos != -1
             ]
-            snippet_idx = min((text.find(term) for term in candidate_terms if text.find(term) != -1), default=0)
+            snippet_idx = min(positions, default=0)
             start = max(0, snippet_idx - 40)
             end = min(len(text), snippet_idx + 160)
             snippet = text[start:end].replace("\n", " ")
@@ -753,7 +1373,7 @@ class PromptThreatDetector(PTDCoreBase):
     ) -> Optional[Dict[str, Any]]:
         # 明确骚扰类正则优先
         for pattern in self.harassment_request_patterns:
-            m = pattern.search(text) or pattern.search(normalized)
+            m = pattern.search(text)
             if m:
                 snippet = text[max(0, m.start() - 40) : min(len(text), m.end() + 40)]
                 return {
@@ -787,8 +1407,8 @@ class PromptThreatDetector(PTDCoreBase):
             if emo:
                 w += 1
             # 片段拼接细节
-            candidate_terms = [term for term in (req_hits + inc_hits + neg_hits + emo_hits) if term in text]
-            idx = min((text.find(t) for t in candidate_terms if text.find(t) != -1), default=0)
+            positions = [pos for pos in (text.find(t) for t in (req_hits + inc_hits + neg_hits + emo_hits)) if pos != -1]
+            idx = min(positions, default=0)
             start = max(0, idx - 40)
             end = min(len(text), idx + 160)
             snippet = text[start:end].replace("\n", " ")
@@ -809,6 +1429,7 @@ class PromptThreatDetector(PTDCoreBase):
         normalized: str,
         signals: List[Dict[str, Any]],
         score: int,
+        present: Optional[FrozenSet[str]] = None,
     ) -> Tuple[int, List[Dict[str, Any]]]:
         found_types: List[str] = []
         # Base64 检测
@@ -826,29 +1447,44 @@ class PromptThreatDetector(PTDCoreBase):
             score += 4
             found_types.append("base64")
 
+        # 其余编码形式：present 为 Hyperscan 给出的存在类别；未知时按各自必备的字面特征
+        # 做 C 级子串判断，缺失时跳过对应的正则扫描。
+        # Base64 没有可靠的必备字符（无填充时不含 "="），上面始终执行
+        if present is None:
+            present = frozenset(
+                kind
+                for kind, hint, haystack in (
+                    ("percent", "%", text),
+                    ("unicode", "\\u", text),
+                    ("hex", "\\x", text),
+                    ("data_uri", "data:", normalized),
+                )
+                if hint in haystack
+            )
+
         # 百分号编码
-        percent_result = self._detect_percent_encoded_payload(text)
+        percent_result = self._detect_percent_encoded_payload(text) if "percent" in present else None
         if percent_result:
             signals.append(percent_result)
             score += percent_result["weight"]
             found_types.append("percent")
 
         # Unicode Escape 编码
-        unicode_result = self._detect_unicode_escape_payload(text)
+        unicode_result = self._detect_unicode_escape_payload(text) if "unicode" in present else None
         if unicode_result:
             signals.append(unicode_result)
             score += unicode_result["weight"]
             found_types.append("unicode")
 
         # Hex Escape 编码
-        hex_result = self._detect_hex_escape_payload(text)
+        hex_result = self._detect_hex_escape_payload(text) if "hex" in present else None
         if hex_result:
             signals.append(hex_result)
             score += hex_result["weight"]
             found_types.append("hex")
 
         # Data URI Base64
-        data_uri_result = self._detect_data_uri_payload(text)
+        data_uri_result = self._detect_data_uri_payload(text) if "data_uri" in present else None
         if data_uri_result:
             signals.append(data_uri_result)
             score += data_uri_result["weight"]
@@ -868,9 +1504,7 @@ class PromptThreatDetector(PTDCoreBase):
             score += 2
 
         # Base64 执行链协同：检测到 base64 + (powershell -enc / certutil -decode)
-        if ("base64" in found_types) and (
-            re.search(r"powershell(?:\\.exe)?\s+-enc", normalized) or re.search(r"certutil\s+-decode", normalized)
-        ):
+        if ("base64" in found_types) and _EXEC_CHAIN_PATTERN.search(normalized):
             signals.append(
                 {
                     "type": "heuristic",
@@ -885,50 +1519,25 @@ class PromptThreatDetector(PTDCoreBase):
         return score, signals
 
     def _detect_base64_payload(self, text: str) -> str:
-        for chunk in self.base64_pattern.findall(text):
-            if len(chunk) > 4096:
-                continue
-            padded = chunk + "=" * ((4 - len(chunk) % 4) % 4)
-            try:
-                decoded_bytes = base64.b64decode(padded, validate=True)
-            except Exception:
+        # 逐个迭代候选片段，先按跨度过滤超长串，避免一次性物化全部匹配
+        trigger_scanner = self._base64_trigger_scanner
+        for match in self.base64_pattern.finditer(text):
+            if match.end() - match.start() > 4096:
                 continue
-            # 尝试识别 gzip 压缩后的载荷
-            try:
-                decoded_bytes = gzip.decompress(decoded_bytes)
-            except Exception:
-                pass
-            try:
-                decoded_text = decoded_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                decoded_text = decoded_bytes.decode("utf-8", "ignore")
-            normalized = decoded_text.lower()
-            keywords = (
-                "ignore previous instructions",
-                "system prompt",
-                "猫娘",
-                "越狱",
-                "jailbreak",
-                "developer mode override",
-                "role: system",
-                "begin prompt",
-                "override",
-            )
-            if any(keyword in normalized for keyword in keywords):
-                preview = decoded_text.replace("\n", " ")[:120]
+            preview = _scan_base64_chunk(match.group(1), trigger_scanner)
+            if preview:
                 return f"解码后包含指令片段: {preview}"
         return ""
 
     def _detect_percent_encoded_payload(self, text: str) -> Optional[Dict[str, Any]]:
-        matches = self.percent_pattern.findall(text)
-        for encoded in matches:
+        for match in self.percent_pattern.finditer(text):
+            encoded = match.group(0)
             try:
                 decoded = unquote(encoded)
             except Exception:
                 continue
-            lower_decoded = decoded.lower()
-            if any(keyword in lower_decoded for keyword in ("system prompt", "override", "jailbreak", "猫娘", "越狱")):
-                preview = decoded.replace("\n", " ")[:120]
+            if self._payload_trigger_scanner.contains_any(decoded.lower()):
+                preview = decoded[:120].replace("\n", " ")
                 return {
                     "type": "payload",
                     "name": "percent_encoded_payload",
@@ -939,18 +1548,19 @@ class PromptThreatDetector(PTDCoreBase):
         return None
 
     def _detect_unicode_escape_payload(self, text: str) -> Optional[Dict[str, Any]]:
-        matches = self.unicode_escape_pattern.findall(text)
-        if not matches:
+        # 仅当整体出现大量 unicode escape 时才处理；逐段写入缓冲区，
+        # 取整段匹配（findall 只会返回捕获组最后一次重复的内容）
+        escaped = bytearray()
+        for match in self.unicode_escape_pattern.finditer(text):
+            escaped += match.group(0).encode("ascii")
+        if not escaped:
             return None
-        # 仅当整体出现大量 unicode escape 时才处理
-        escaped_str = "".join(matches)
         try:
-            decoded = escaped_str.encode("utf-8").decode("unicode_escape")
+            decoded = codecs.unicode_escape_decode(escaped)[0]
         except Exception:
             return None
-        lower_decoded = decoded.lower()
-        if any(keyword in lower_decoded for keyword in ("system prompt", "越狱", "猫娘", "jailbreak", "override")):
-            preview = decoded.replace("\n", " ")[:120]
+        if self._payload_trigger_scanner.contains_any(decoded.lower()):
+            preview = decoded[:120].replace("\n", " ")
             return {
                 "type": "payload",
                 "name": "unicode_escape_payload",
@@ -961,21 +1571,19 @@ class PromptThreatDetector(PTDCoreBase):
         return None
 
     def _detect_hex_escape_payload(self, text: str) -> Optional[Dict[str, Any]]:
-        matches = self.hex_escape_pattern.findall(text)
-        if not matches:
-            return None
-        try:
-            hex_pairs = re.findall(r"\\x([0-9A-Fa-f]{2})", "".join(matches))
-            hex_bytes = bytes(int(h, 16) for h in hex_pairs)
-        except Exception:
+        # 逐段去掉 "\x" 前缀后由 bytes.fromhex 转换并写入缓冲区，
+        # 取整段匹配（findall 只会返回捕获组最后一次重复的内容）
+        hex_bytes = bytearray()
+        for match in self.hex_escape_pattern.finditer(text):
+            hex_bytes += bytes.fromhex(match.group(0).replace("\\x", ""))
+        if not hex_bytes:
             return None
         try:
             decoded = hex_bytes.decode("utf-8")
         except Exception:
             decoded = hex_bytes.decode("utf-8", "ignore")
-        lower_decoded = decoded.lower()
-        if any(keyword in lower_decoded for keyword in ("system prompt", "jailbreak", "override", "猫娘", "越狱")):
-            preview = decoded.replace("\n", " ")[:120]
+        if self._payload_trigger_scanner.contains_any(decoded.lower()):
+            preview = decoded[:120].replace("\n", " ")
             return {
                 "type": "payload",
                 "name": "hex_escape_payload",
@@ -992,16 +1600,15 @@ class PromptThreatDetector(PTDCoreBase):
         chunk = m.group(1)
         padded = chunk + "=" * ((4 - len(chunk) % 4) % 4)
         try:
-            decoded_bytes = base64.b64decode(padded, validate=True)
+            decoded_bytes = _b64decode_large(padded)
         except Exception:
             return None
         try:
             decoded_text = decoded_bytes.decode("utf-8")
         except Exception:
             decoded_text = decoded_bytes.decode("utf-8", "ignore")
-        lower_decoded = decoded_text.lower()
-        if any(k in lower_decoded for k in ("system prompt", "override", "jailbreak", "猫娘", "越狱")):
-            preview = decoded_text.replace("\n", " ")[:120]
+        if self._payload_trigger_scanner.contains_any(decoded_text.lower()):
+            preview = decoded_text[:120].replace("\n", " ")
             return {
                 "type": "payload",
                 "name": "data_uri_payload",
@@ -1019,10 +1626,16 @@ class PromptThreatDetector(PTDCoreBase):
         score: int,
     ) -> Tuple[int, List[Dict[str, Any]]]:
         suspicious_links = []
-        for match in re.findall(r"https?://[^\s]+", text):
-            lower = match.lower()
-            if any(domain in lower for domain in self.malicious_domains):
-                suspicious_links.append(match)
+        domain_scanner = self._domain_scanner
+        # 域名均为 ASCII，链接小写后命中则全文小写中必然命中；全文未出现任何域名时无需提取链接
+        if domain_scanner.contains_any(normalized):
+            # 小写前后长度一致时逐字符对齐，直接截取全文小写中的对应片段，不再逐条 lower
+            aligned = len(normalized) == len(text)
+            for match in _URL_PATTERN.finditer(text):
+                link = match.group(0)
+                lowered = normalized[match.start():match.end()] if aligned else link.lower()
+                if domain_scanner.contains_any(lowered):
+                    suspicious_links.append(link)
 
         if suspicious_links:
             signals.append(
@@ -1050,7 +1663,7 @@ class PromptThreatDetector(PTDCoreBase):
             score += 2
 
         # 命令拉取 + 恶意外链协同加权
-        if suspicious_links and re.search(r"(curl|wget|invoke-?webrequest|iwr|powershell|bitsadmin|certutil|aria2c)\b", normalized):
+        if suspicious_links and _FETCH_COMMAND_PATTERN.search(normalized):
             signals.append(
                 {
                     "type": "heuristic",
@@ -1064,11 +1677,19 @@ class PromptThreatDetector(PTDCoreBase):
 
         return score, signals
 
-    def _score_to_severity(self, score: int) -> str:
-        if score >= self.high_threshold:
-            return "high"
-        if score >= self.medium_threshold:
-            return "medium"
-        if score > 0:
-            return "low"
-        return "none"
+
+_default_detector: Optional[PromptThreatDetector] = None
+_default_detector_lock = threading.Lock()
+
+
+def get_default_detector() -> PromptThreatDetector:
+    """
+    返回共享的默认检测器实例，调用方可直接复用，免去重复构建。
+    首次调用时才构建（启用 Hyperscan 时编译耗时可达十余秒），异步调用方应放到线程中执行。
+    """
+    global _default_detector
+    if _default_detector is None:
+        with _default_detector_lock:
+            if _default_detector is None:
+                _default_detector = PromptThreatDetector()
+    return _default_detector
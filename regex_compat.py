@@ -0,0 +1,56 @@
+"""Python 正则到 re2 / Hyperscan 语法的翻译，供 ptd_core 与 persona_core 共用。"""
+
+from typing import List, Optional
+
+# Python 的 \s/\S 默认匹配 Unicode；re2 中仅 ASCII，Hyperscan（UCP）的 \s 也不含 \x1c-\x1f，
+# 统一翻译为等价的显式 Unicode 字符类。\d 不翻译：两者的 \p{Nd} 均缺少较新 Unicode 版本中的数字
+_RE2_SPACE_ITEMS = r"\t-\r\x{1c}-\x{1f}\x{85}\p{Z}"
+_RE2_CLASS_MAP = {
+    "s": f"[{_RE2_SPACE_ITEMS}]",
+    "S": f"[^{_RE2_SPACE_ITEMS}]",
+}
+# 字符集 [...] 内部的翻译（\S 在字符集内无法等价展开）
+_RE2_CLASS_MAP_IN_SET = {
+    "s": _RE2_SPACE_ITEMS,
+}
+
+
+def to_re2_syntax(pattern: str) -> Optional[str]:
+    r"""
+    将 Python 正则翻译为语义一致的 re2 / Hyperscan 语法（\s/\S 换成显式 Unicode 字符类）。
+    含无法等价表达的 \d/\w/\b 等（或字符集内的 \S）时返回 None，由调用方回退到 re。
+    """
+    out: List[str] = []
+    in_set = False
+    set_body_start = 0
+    i = 0
+    n = len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == "\\" and i + 1 < n:
+            escape = pattern[i + 1]
+            table = _RE2_CLASS_MAP_IN_SET if in_set else _RE2_CLASS_MAP
+            if escape in table:
+                out.append(table[escape])
+            elif escape in "sSdDwWbB":
+                return None
+            else:
+                out.append(pattern[i : i + 2])
+            i += 2
+            continue
+        if in_set:
+            # 紧跟 "[" 或 "[^" 的 "]" 是字面量
+            if char == "]" and i > set_body_start:
+                in_set = False
+        elif char == "[":
+            j = i + 1
+            if j < n and pattern[j] == "^":
+                j += 1
+            in_set = True
+            set_body_start = j
+            out.append(pattern[i:j])
+            i = j
+            continue
+        out.append(char)
+        i += 1
+    return "".join(out)
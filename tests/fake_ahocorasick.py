@@ -0,0 +1,26 @@
+"""pyahocorasick 的纯 Python 替身，用于在未安装可选依赖时测试自动机后端与回退路径的一致性。"""
+
+import types
+
+
+class FakeAutomaton:
+    """pyahocorasick.Automaton 的最小替身：按结束位置输出，同一结束位置先输出较长的词条，每个词条只保留一个值。"""
+
+    def __init__(self):
+        self._words = {}
+
+    def add_word(self, word, value):
+        self._words[word] = value
+
+    def make_automaton(self):
+        pass
+
+    def iter(self, text):
+        for end in range(len(text)):
+            for word in sorted(self._words, key=len, reverse=True):
+                start = end - len(word) + 1
+                if start >= 0 and text.startswith(word, start):
+                    yield end, self._words[word]
+
+
+FAKE_AHOCORASICK = types.SimpleNamespace(Automaton=FakeAutomaton)
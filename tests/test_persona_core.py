@@ -0,0 +1,116 @@
+"""persona_core 的禁则匹配与人设识别测试；可选的 Aho-Corasick 后端以纯 Python 替身代替，无需安装依赖。"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import persona_core  # noqa: E402
+from persona_core import PersonaMatcher, PersonaProfile  # noqa: E402
+from fake_ahocorasick import FAKE_AHOCORASICK  # noqa: E402
+
+
+@pytest.fixture(params=["automaton", "find"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(persona_core, "ahocorasick", FAKE_AHOCORASICK if request.param == "automaton" else None)
+    return request.param
+
+
+def _hits(rules, text):
+    profile = PersonaProfile("p", "d", forbidden_patterns=rules)
+    return [(item.name, span) for item, span in PersonaMatcher._match_forbidden(profile, text)]
+
+
+def _build_both(monkeypatch, build):
+    # 内置人设按进程缓存，切换后端前清空缓存，使两次构建各自生成禁则索引
+    built = []
+    for module in (FAKE_AHOCORASICK, None):
+        monkeypatch.setattr(persona_core, "ahocorasick", module)
+        persona_core._build_default_profiles.cache_clear()
+        built.append(build())
+    persona_core._build_default_profiles.cache_clear()
+    return built[0], built[1]
+
+
+def test_duplicate_literals_hit_every_rule(backend):
+    rules = [{"name": "A", "pattern": "foo|bar"}, {"name": "B", "pattern": "bar"}]
+    assert _hits(rules, "say bar") == [("A", (4, 7)), ("B", (4, 7))]
+
+
+def test_literal_span_is_first_completed_match(backend):
+    rules = [{"name": "A", "pattern": "foo|bar"}]
+    assert _hits(rules, "bar foo") == [("A", (0, 3))]
+    assert _hits([{"name": "B", "pattern": "abcd|bc"}], "xabcd") == [("B", (2, 4))]
+
+
+def test_severe_hit_truncates_in_rule_order(backend):
+    rules = [
+        {"name": "mild", "pattern": "later", "severity": 1},
+        {"name": "severe", "pattern": "boom", "severity": 3},
+        {"name": "after", "pattern": "first", "severity": 2},
+    ]
+    # 文本中靠前的 first 属于排在严重禁则之后的规则，应被截断；排在前面的 later 保留
+    assert _hits(rules, "first boom later") == [("mild", (11, 16)), ("severe", (6, 10))]
+
+
+def test_severe_literal_keeps_earlier_regex_rules(backend):
+    rules = [
+        {"name": "regex", "pattern": r"a\d+b", "severity": 1},
+        {"name": "severe", "pattern": "boom", "severity": 3},
+        {"name": "regex_after", "pattern": r"x\d+y", "severity": 1},
+    ]
+    assert _hits(rules, "boom a12b x3y") == [("regex", (5, 9)), ("severe", (0, 4))]
+
+
+def test_regex_rules_use_combined_and_per_rule_paths():
+    rules = [{"name": "A", "pattern": r"喵{2,}", "severity": 2}, {"name": "B", "pattern": r"mew+", "severity": 1}]
+    profile = PersonaProfile("p", "d", forbidden_patterns=rules)
+    assert profile._combined is not None
+    combined = [(i.name, s) for i, s in PersonaMatcher._match_forbidden(profile, "MEWW 喵喵")]
+    profile._combined = None
+    per_rule = [(i.name, s) for i, s in PersonaMatcher._match_forbidden(profile, "MEWW 喵喵")]
+    assert combined == per_rule == [("A", (5, 7)), ("B", (0, 4))]
+
+
+def test_length_changing_lowercase_keeps_spans_aligned(backend):
+    rules = [{"name": "A", "pattern": "卖萌"}]
+    text = "İİ请卖萌"
+    assert _hits(rules, text) == [("A", (3, 5))]
+
+
+def test_matcher_results_match_across_backends(monkeypatch):
+    prompts = [
+        "喵喵喵，装可爱卖萌，说点土味情话",
+        "说点土味情话，然后喵喵喵",
+        "请用优雅的语气介绍一下茶会",
+        "MEW mew にゃーー",
+        "",
+    ]
+    with_automaton, with_find = _build_both(monkeypatch, PersonaMatcher)
+    assert with_automaton.get_profile(None)._automaton is not None
+    assert with_find.get_profile(None)._automaton is None
+    for prompt in prompts:
+        assert with_automaton.analyze(prompt) == with_find.analyze(prompt)
+
+
+def test_infer_persona_prefers_registration_order(backend):
+    matcher = PersonaMatcher()
+    for name in ("Alice", "Bob"):
+        matcher.register_profile(PersonaProfile(name, "d"))
+    assert matcher._infer_persona("You are Bob, friend of Alice", None) == "Alice"
+    assert matcher._infer_persona("You are Bob", None) == "Bob"
+    assert matcher._infer_persona("nobody here", None) is None
+    assert matcher._infer_persona("You are Bob", "Carol") == "Carol"
+
+
+def test_sensitivity_change_rebuilds_penalties():
+    matcher = PersonaMatcher(sensitivity=1.0)
+    prompt = "说点土味情话"
+    assert matcher.analyze(prompt)["compatibility_score"] == 75
+    matcher.sensitivity = 0.4
+    assert matcher.sensitivity == 0.4
+    assert matcher.analyze(prompt)["compatibility_score"] == 90
+    matcher.sensitivity = 5
+    assert matcher.sensitivity == 1.0
@@ -0,0 +1,56 @@
+"""预筛（Hyperscan / re2）与逐条 re 匹配的结果一致性回归测试。"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ptd_core import PromptThreatDetector  # noqa: E402
+
+# Python 的 \s 包含 \x1c-\x1f，Hyperscan（UCP）与 re2 的 \s 不包含
+_SEPARATORS = "\x1c\x1d\x1e\x1f"
+_TEMPLATES = (
+    "[system{0}internal]:",
+    "/system{0}x",
+    "powershell{0}-enc " + "A" * 40,
+    "BEGIN{0}PROMPT",
+    "<!--{0}override",
+    '"role"{0}:{0}"system"',
+    "show me chain{0}of thought",
+)
+
+
+@pytest.fixture(scope="module")
+def detectors():
+    prefiltered = PromptThreatDetector()
+    if prefiltered._hs_db is None and prefiltered._re2_set is None:
+        pytest.skip("未安装 hyperscan / re2，无预筛路径")
+    plain = PromptThreatDetector()
+    plain._hs_db = None
+    plain._re2_set = None
+    prefiltered.cache_size = 0
+    plain.cache_size = 0
+    return prefiltered, plain
+
+
+@pytest.mark.parametrize("separator", _SEPARATORS)
+@pytest.mark.parametrize("template", _TEMPLATES)
+def test_prefilter_matches_plain_re(detectors, template, separator):
+    prefiltered, plain = detectors
+    text = template.format(separator)
+    expected = plain.analyze(text)
+    assert expected["score"] > 0
+    assert prefiltered.analyze(text)["score"] == expected["score"]
+
+
+def test_prefilter_matches_plain_re_on_new_unicode_digits(detectors):
+    # U+10D30 起为 Unicode 11 新增数字，Hyperscan / re2 的 \p{Nd} 不包含
+    prefiltered, plain = detectors
+    digit = "\U00010D31"
+    text = f"[{digit * 2}:{digit * 2}:{digit * 2}][{digit * 6}] hello"
+    expected = plain.analyze(text)
+    assert expected["score"] > 0
+    assert prefiltered.analyze(text)["score"] == expected["score"]
+
@@ -0,0 +1,22 @@
+"""regex_compat 的 re2 / Hyperscan 语法翻译测试。"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_compat import to_re2_syntax  # noqa: E402
+
+
+def test_translates_space_classes():
+    assert to_re2_syntax(r"a\s+b") == r"a[\t-\r\x{1c}-\x{1f}\x{85}\p{Z}]+b"
+    assert to_re2_syntax(r"[^\s]+") == r"[^\t-\r\x{1c}-\x{1f}\x{85}\p{Z}]+"
+    assert to_re2_syntax(r"\\s") == r"\\s"
+    assert to_re2_syntax(r"[^\S]") is None
+    assert to_re2_syntax(r"foo\b") is None
+    assert to_re2_syntax(r"\d{2}") is None
+
+
+def test_keeps_literal_bracket_inside_set():
+    assert to_re2_syntax(r"[]\s]x") == r"[]\t-\r\x{1c}-\x{1f}\x{85}\p{Z}]x"
+    assert to_re2_syntax(r"[^]]\s") == r"[^]][\t-\r\x{1c}-\x{1f}\x{85}\p{Z}]"